@@ -13,9 +13,11 @@ from ui_elements import (
     skills_competencies_page,
     benefits_compensation_page,
     recruitment_process_page,
-    summary_outputs_page
+    summary_outputs_page,
+    show_llm_metrics
 )
 from functions import initialize_session_state
+import config
 
 def main():
     st.set_page_config(page_title="Vacalyser - An AI-driven job analysis tool", layout="centered")
@@ -116,5 +118,8 @@ def main():
     # Next / Previous
     show_navigation(current_idx, total_sections)
 
+    if config.LLM_SHOW_METRICS:
+        show_llm_metrics()
+
 if __name__ == "__main__":
     main()
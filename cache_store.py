@@ -0,0 +1,252 @@
+# cache_store.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Build a content-addressed cache key: the SHA-256 of the canonical JSON
+    encoding of all parts (dict keys sorted, so option order never matters).
+    """
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache in a single SQLite file.
+
+    Entries expire after `ttl` seconds (None = never) and the file is kept
+    under `max_bytes` of payload by evicting the least recently used rows.
+    Safe to share between threads and between processes on the same host.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored bytes for `key`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store `value` under `key` and evict LRU entries beyond max_bytes."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict()
+
+    def get_text(self, key: str) -> Optional[str]:
+        value = self.get(key)
+        return None if value is None else value.decode("utf-8")
+
+    def set_text(self, key: str, text: str) -> None:
+        self.set(key, text.encode("utf-8"))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def acquire_lease(self, key: str, seconds: float) -> Optional[str]:
+        """Take the lease on `key` for `seconds` unless another live holder has it; returns a token or None."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO leases (key, token, expires_at) VALUES (?, ?, ?)", (key, token, now + seconds)
+            )
+            return token if cursor.rowcount == 1 else None
+
+    def release_lease(self, key: str, token: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND token = ?", (key, token))
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU mapping holding at most `max_entries` items."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """
+    Key/value cache in Redis (or any server speaking its protocol), shared
+    by every replica pointing at the same URL. Same interface as
+    SQLiteCache; entries expire after `ttl` seconds and Redis' own
+    maxmemory policy does the eviction. `redis` is imported only when this
+    backend is used; pass `client` to run against a stand-in.
+    """
+
+    # Delete the lease only if we still hold it (it may have expired and been re-taken)
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str = "", ttl: Optional[float] = None, prefix: str = "", client: Any = None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=int(self.ttl) if self.ttl else None)
+
+    def get_text(self, key: str) -> Optional[str]:
+        value = self.get(key)
+        return None if value is None else value.decode("utf-8")
+
+    def set_text(self, key: str, text: str) -> None:
+        self.set(key, text.encode("utf-8"))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def acquire_lease(self, key: str, seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        acquired = self.client.set(self.prefix + "lease:" + key, token, nx=True, px=int(seconds * 1000))
+        return token if acquired else None
+
+    def release_lease(self, key: str, token: str) -> None:
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.prefix + "lease:" + key, token)
+
+
+def open_cache(url: str, path: str, max_bytes: int, ttl: Optional[float] = None, prefix: str = ""):
+    """
+    Cache backend for `url`: "redis://..."/"rediss://..." opens a shared
+    RedisCache, anything else (including "") the SQLite file at `path`.
+    """
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, ttl=ttl, prefix=prefix)
+    return SQLiteCache(path, max_bytes=max_bytes, ttl=ttl)
+
+
+def single_flight(cache, key: str, compute: Callable[[], Optional[bytes]], lease: float = 180.0,
+                  poll: float = 0.25) -> Optional[bytes]:
+    """
+    Return the cached value for `key`, computing it at most once across all
+    processes sharing `cache`: the caller that takes the lease computes and
+    stores the value, the others poll the cache until it appears. If the
+    lease holder dies or fails, its lease runs out and the next caller takes
+    over; waiters never wait longer than one lease before computing
+    themselves. `compute` returning None stores nothing.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    deadline = time.time() + lease
+    while True:
+        token = cache.acquire_lease(key, lease)
+        if token is not None:
+            try:
+                # Someone may have finished between our miss and taking the lease
+                value = cache.get(key)
+                if value is None:
+                    value = compute()
+                    if value is not None:
+                        cache.set(key, value)
+                return value
+            finally:
+                cache.release_lease(key, token)
+        time.sleep(poll)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if time.time() >= deadline:
+            return compute()
@@ -1 +1,127 @@
 #config.py
+
+import os
+
+# -------------------------
+# LLM Backends
+# -------------------------
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+OLLAMA_GENERATE_URL = f"{OLLAMA_BASE_URL}/api/generate"
+# Ollama >= 0.5 constrains output to a JSON schema passed as `format`; older
+# servers only understand format="json", which is sent instead when this is 0.
+OLLAMA_JSON_SCHEMA = os.getenv("OLLAMA_JSON_SCHEMA", "1") == "1"
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+
+# -------------------------
+# HTTP Connection Pool
+# -------------------------
+# One pool per host; the pool size caps the keep-alive sockets we hold open
+# towards Ollama/Groq across all Streamlit sessions in this process.
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+
+# -------------------------
+# LLM Scheduling
+# -------------------------
+# Requests sent concurrently per backend; the rest queue in-process with
+# interactive calls ahead of background prefetch. Ollama on a CPU box
+# serves one generation at a time anyway, so queueing here costs nothing.
+LLM_MAX_IN_FLIGHT_OLLAMA = int(os.getenv("LLM_MAX_IN_FLIGHT_OLLAMA", "1"))
+LLM_MAX_IN_FLIGHT_GROQ = int(os.getenv("LLM_MAX_IN_FLIGHT_GROQ", "4"))
+# Show queue depth / wait / service times in the sidebar
+LLM_SHOW_METRICS = os.getenv("LLM_SHOW_METRICS", "0") == "1"
+
+# -------------------------
+# LLM Response Cache
+# -------------------------
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.sqlite"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# "" keeps the cache in the SQLite file above (shared by processes on one host);
+# "redis://host:6379/0" shares it between all replicas behind the load balancer.
+CACHE_BACKEND_URL = os.getenv("CACHE_BACKEND_URL", "")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "vacalyser:")
+# Identical generations run once across replicas: one takes a lease for this
+# long (> LLM_READ_TIMEOUT), the others poll the cache every SINGLE_FLIGHT_POLL s.
+SINGLE_FLIGHT_LEASE = float(os.getenv("SINGLE_FLIGHT_LEASE", "180"))
+SINGLE_FLIGHT_POLL = float(os.getenv("SINGLE_FLIGHT_POLL", "0.25"))
+
+# -------------------------
+# Background Prefetch
+# -------------------------
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+# -------------------------
+# Embeddings & Vector Index
+# -------------------------
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("data", "embedding_cache"))
+EMBEDDING_CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "10000"))
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", os.path.join("data", "faiss"))
+# Corpora up to this size use an exact flat index; larger ones HNSW/IVF.
+FAISS_FLAT_MAX = int(os.getenv("FAISS_FLAT_MAX", "50000"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+# Characters of each record kept next to its vector for RAG passages; the
+# rest of the text is not stored with the index.
+FAISS_PASSAGE_CHARS = int(os.getenv("FAISS_PASSAGE_CHARS", "2000"))
+
+# -------------------------
+# Skill Taxonomy
+# -------------------------
+# JSON file of {category: [keywords]} used to categorize skills; overrides the compiled index
+SKILL_TAXONOMY_PATH = os.getenv("SKILL_TAXONOMY_PATH", "")
+# Compiled index built from the skills corpus (`python job_import.py taxonomy`);
+# the built-in default taxonomy is used until it exists
+SKILL_TAXONOMY_INDEX = os.getenv("SKILL_TAXONOMY_INDEX", os.path.join("data", "skill_taxonomy.bin"))
+# JSON file of extra {alias: canonical name} pairs for skill de-duplication
+SKILL_ALIASES_PATH = os.getenv("SKILL_ALIASES_PATH", "")
+# Character-trigram Jaccard similarity at which two skill names are merged
+SKILL_FUZZY_THRESHOLD = float(os.getenv("SKILL_FUZZY_THRESHOLD", "0.7"))
+
+# -------------------------
+# Document Extraction
+# -------------------------
+# Stop reading a PDF once this many characters were extracted (0 = no limit).
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "100000"))
+# Worker processes for page extraction; only used for PDFs with at least
+# PDF_PARALLEL_MIN_PAGES pages (0 = always serial).
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "4"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+# Extracted upload text, keyed by the SHA-256 of the file bytes
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", os.path.join("data", "extraction_cache.sqlite"))
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EXTRACTION_CACHE_LRU_SIZE = int(os.getenv("EXTRACTION_CACHE_LRU_SIZE", "32"))
+
+# -------------------------
+# URL Fetching
+# -------------------------
+URL_FETCH_TIMEOUT = float(os.getenv("URL_FETCH_TIMEOUT", "10"))
+URL_FETCH_MAX_CONNECTIONS = int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "32"))
+URL_FETCH_PER_HOST = int(os.getenv("URL_FETCH_PER_HOST", "4"))
+URL_FETCH_MAX_BYTES = int(os.getenv("URL_FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join("data", "http_cache.sqlite"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# -------------------------
+# Auto-fill Extraction
+# -------------------------
+# Context window and answer length for the JSON field extraction calls;
+# long texts are split into chunks that fit num_ctx - num_predict.
+AUTOFILL_NUM_CTX = int(os.getenv("AUTOFILL_NUM_CTX", "2048"))
+AUTOFILL_NUM_PREDICT = int(os.getenv("AUTOFILL_NUM_PREDICT", "256"))
+AUTOFILL_CHUNK_OVERLAP_TOKENS = int(os.getenv("AUTOFILL_CHUNK_OVERLAP_TOKENS", "32"))
+AUTOFILL_WORKERS = int(os.getenv("AUTOFILL_WORKERS", "4"))
+# Optional extra cities (one per line) for the rule-based location extractor
+LOCATION_GAZETTEER_PATH = os.getenv("LOCATION_GAZETTEER_PATH", "")
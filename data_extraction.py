@@ -1 +1,759 @@
 #data_extraction.py
+
+import hashlib
+import json
+import os
+import queue
+import re
+import tarfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+import config
+import llm_client
+
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "txt")
+
+# -------------------------
+# Document Sources
+# -------------------------
+def _extension(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def iter_documents(source: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield (path, bytes) for every PDF/DOCX/TXT job ad in a directory tree or
+    in a .zip / .tar(.gz|.bz2|.xz) archive, one file in memory at a time.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if _extension(name) in SUPPORTED_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        yield path, f.read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _extension(info.filename) in SUPPORTED_EXTENSIONS:
+                    yield f"{source}/{info.filename}", archive.read(info)
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if member.isfile() and _extension(member.name) in SUPPORTED_EXTENSIONS:
+                    yield f"{source}/{member.name}", archive.extractfile(member).read()
+    else:
+        raise ValueError(f"{source} is neither a directory nor a zip/tar archive")
+
+# -------------------------
+# Parsing
+# -------------------------
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces/tabs, keep paragraph breaks."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+def parse_document(path: str, data: bytes) -> Dict:
+    """
+    Turn one job ad file into a normalised record using the same
+    extract_text_from_* functions as the upload page (full text, no page
+    budget). Parse failures are recorded in "error" instead of raised.
+    """
+    from functions import extract_text_from_bytes
+
+    ext = _extension(path)
+    record = {
+        "source_path": path,
+        "file_name": os.path.basename(path),
+        "extension": ext,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size_bytes": len(data),
+        "job_description": "",
+        "num_chars": 0,
+        "error": "",
+    }
+    try:
+        # Already running inside a worker process: extract PDF pages serially
+        text = extract_text_from_bytes(data, ext, max_chars=0, workers=0)["job_description"]
+        record["job_description"] = normalize_whitespace(text)
+        record["num_chars"] = len(record["job_description"])
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def parse_documents(source: str, workers: int = 4) -> Iterator[Dict]:
+    """
+    Parse every document under `source` in a process pool and yield the
+    records as they complete. At most 4 files per worker are in flight, so
+    memory stays bounded for large archives. workers=0 parses in-process.
+    """
+    documents = iter_documents(source)
+    if workers <= 0:
+        for path, data in documents:
+            yield parse_document(path, data)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for path, data in documents:
+            in_flight.add(pool.submit(parse_document, path, data))
+            if len(in_flight) >= 4 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in in_flight:
+            yield future.result()
+
+# -------------------------
+# HTML Main Content
+# -------------------------
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form", "button",
+                    "nav", "header", "footer", "aside", "dialog"]
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|consent|gdpr|banner|navbar|\bnav\b|menu|footer|header|sidebar|breadcrumb|"
+    r"share|social|newsletter|modal|popup|related|recommend|subscribe",
+    re.IGNORECASE,
+)
+# Readability's positive markers, matched against whole words of a class/id
+# token ("main", "job-content") that carries no boilerplate word itself, so
+# "main-menu" or "cookie-consent-content" do not count as content
+CONTENT_WORDS = {"content", "main", "article", "body", "column"}
+TEXT_BLOCK_TAGS = ["p", "li", "h1", "h2", "h3", "h4", "dd", "td", "pre", "blockquote"]
+MIN_BLOCK_CHARS = 25
+
+
+BLOCK_TAGS = ["p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd", "tr", "table",
+              "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote"]
+
+
+def _block_text(tag) -> str:
+    """get_text that breaks lines only after block elements, not inside inline markup."""
+    for br in tag.find_all("br"):
+        br.replace_with("\n")
+    for block in tag.find_all(BLOCK_TAGS):
+        block.append("\n")
+    return tag.get_text("")
+
+
+def _job_posting_from_json_ld(soup: BeautifulSoup) -> str:
+    """Return the description of a schema.org JobPosting, if the page embeds one."""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except json.JSONDecodeError:
+            continue
+        items = data if isinstance(data, list) else data.get("@graph", [data]) if isinstance(data, dict) else []
+        for item in items:
+            if isinstance(item, dict) and item.get("@type") == "JobPosting" and item.get("description"):
+                title = item.get("title", "")
+                description = _block_text(BeautifulSoup(item["description"], "html.parser"))
+                return f"{title}\n{description}".strip()
+    return ""
+
+
+def _marker_tokens(tag) -> List[str]:
+    attrs = getattr(tag, "attrs", None) or {}
+    return [attrs.get("id") or "", *(attrs.get("class") or []), attrs.get("role") or ""]
+
+
+def _is_content_token(token: str) -> bool:
+    words = re.split(r"[-_\s]+", token.lower())
+    return any(word in CONTENT_WORDS for word in words) and BOILERPLATE_PATTERN.search(token) is None
+
+
+def _is_boilerplate(tag) -> bool:
+    tokens = _marker_tokens(tag)
+    return (any(BOILERPLATE_PATTERN.search(token) for token in tokens)
+            and not any(_is_content_token(token) for token in tokens))
+
+
+def _is_content(tag) -> bool:
+    return any(_is_content_token(token) for token in _marker_tokens(tag))
+
+
+def _paragraph_chars(root) -> Dict[int, int]:
+    """
+    Characters of text inside TEXT_BLOCK_TAGS for every element under root,
+    keyed by id(), in one bottom-up pass (no get_text per element).
+    """
+    order, stack = [], [(root, False)]
+    while stack:
+        tag, in_block = stack.pop()
+        in_block = in_block or tag.name in TEXT_BLOCK_TAGS
+        order.append((tag, in_block))
+        stack.extend((child, in_block) for child in tag.contents if isinstance(child, Tag))
+    counts = {}
+    # Reversed pre-order visits every child before its parent
+    for tag, in_block in reversed(order):
+        total = 0
+        for child in tag.contents:
+            if isinstance(child, Tag):
+                total += counts[id(child)]
+            elif in_block and type(child) is NavigableString:
+                total += len(child.strip())
+        counts[id(tag)] = total
+    return counts
+
+
+def _with_content_siblings(container, title) -> list:
+    """
+    The container plus siblings marked as content or holding the posting's
+    title ("content-header" with the title and location next to the
+    description), in document order.
+    """
+    if container.parent is None:
+        return [container]
+    title_path = {id(tag) for tag in title.parents} | {id(title)} if title is not None else set()
+    return [sibling for sibling in container.parent.find_all(True, recursive=False)
+            if sibling is container or id(sibling) in title_path or _is_content(sibling)]
+
+
+def _body_text(html: str) -> str:
+    """Fallback: all visible text of the page, minus scripts and styles."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.find_all(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    return _block_text(soup.body or soup)
+
+
+def extract_main_text(html: str, max_chars: int = 0) -> str:
+    """
+    Reduce an HTML page to the text of its main content (the job posting).
+
+    A schema.org JobPosting in JSON-LD wins if present. Otherwise scripts,
+    styles, navigation, headers/footers and cookie/consent/menu blocks are
+    dropped, unless their id/class also looks like content, they hold
+    most of the page's paragraph text or they contain the posting's <h1>.
+    The container that collects the most paragraph text (Readability-style:
+    each block scores its parent fully and its grandparent by half,
+    discounted by link density) is returned; if that is empty, the whole
+    body text is. Text lengths come from one bottom-up pass, so parsing
+    and scoring stay linear in the document size. `max_chars` (0 = no
+    limit) caps the result.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    text = _job_posting_from_json_ld(soup)
+    if not text:
+        for tag in soup.find_all(NON_CONTENT_TAGS):
+            tag.decompose()
+        title = soup.find("h1")
+        title_path = {id(title)} | {id(tag) for tag in title.parents} if title is not None else set()
+        # Keyed by id(): bs4 hashes a Tag by its serialised markup, which is not O(1)
+        chars = _paragraph_chars(soup)
+        for tag in soup.find_all(_is_boilerplate):
+            if tag.name in ("html", "body", "main", "article") or tag.decomposed or id(tag) in title_path:
+                continue
+            if chars[id(tag)] * 2 <= chars[id(soup)]:
+                tag.decompose()
+
+        chars = _paragraph_chars(soup)
+        scores, tags = {}, {}
+        for block in soup.find_all(TEXT_BLOCK_TAGS):
+            length = chars[id(block)]
+            if length < MIN_BLOCK_CHARS:
+                continue
+            for ancestor, weight in ((block.parent, 1.0), (block.parent.parent if block.parent else None, 0.5)):
+                if ancestor is not None:
+                    tags[id(ancestor)] = ancestor
+                    scores[id(ancestor)] = scores.get(id(ancestor), 0) + length * weight
+
+        container = None
+        best = 0.0
+        for key, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:5]:
+            candidate = tags[key]
+            total = len(candidate.get_text(" ", strip=True)) or 1
+            links = sum(len(a.get_text(" ", strip=True)) for a in candidate.find_all("a"))
+            score *= 1 - links / total
+            if score > best:
+                container, best = candidate, score
+        if container is None:
+            container = soup.find("main") or soup.find("article") or soup.body or soup
+        text = "\n".join(_block_text(part) for part in _with_content_siblings(container, title))
+        if not text.strip():
+            text = _body_text(html)
+
+    text = normalize_whitespace(text)
+    return text[:max_chars] if max_chars else text
+
+# -------------------------
+# Auto-fill Field Extraction
+# -------------------------
+# Fields the start discovery page fills from a job ad. Single-valued fields
+# keep the first value found; multi-valued ones collect values across chunks.
+MULTI_VALUE_FIELDS = ["technologies_used", "tasks", "benefits", "learning_opportunities", "health_benefits"]
+AUTOFILL_FIELDS = ["company_name", "location", "company_website", "technologies_used", "travel_required",
+                   "remote_policy", "tasks", "salary_range", "benefits", "learning_opportunities", "health_benefits"]
+LIST_FIELDS = ["technologies_used"]
+
+# -------------------------
+# Rule-based Field Extraction
+# -------------------------
+# Fields that are often machine-recognisable are pulled out with compiled
+# patterns first; the LLM is only asked for what is still missing.
+URL_PATTERN = re.compile(r"\b(?:https?://|www\.)[^\s<>\"'()\[\]]+", re.IGNORECASE)
+# Links in a job ad often point at the board or ATS it was posted on, not the company
+JOB_BOARD_DOMAINS = ("linkedin.", "indeed.", "stepstone.", "glassdoor.", "xing.", "monster.", "greenhouse.io",
+                     "lever.co", "workday", "personio.", "smartrecruiters.", "join.com", "google.", "facebook.", "twitter.")
+
+_CURRENCY = r"(?:€|\$|£|CHF|EUR|USD|GBP|Euro)"
+_AMOUNT = r"\d{1,3}(?:[.,' ]\d{3})+(?:[.,]\d{1,2})?\s?[kK]?|\d+(?:[.,]\d+)?\s?[kK]\b|\d{4,7}"
+SALARY_RANGE_PATTERN = re.compile(
+    rf"(?:{_CURRENCY}\s?)?(?:{_AMOUNT})\s?(?:{_CURRENCY}\s?)?(?:-|–|—|to|bis)\s?(?:{_CURRENCY}\s?)?(?:{_AMOUNT})(?:\s?{_CURRENCY})?"
+)
+SALARY_SINGLE_PATTERN = re.compile(rf"{_CURRENCY}\s?(?:{_AMOUNT})|(?:{_AMOUNT})\s?{_CURRENCY}")
+SALARY_KEYWORDS = re.compile(r"\b(?:salary|compensation|pay|gehalt|vergütung|base)\b", re.IGNORECASE)
+CURRENCY_PATTERN = re.compile(_CURRENCY)
+
+# Values match the remote policy options on the company information page.
+# A negated keyword means on-site, and is removed before the other patterns
+# run: "no home office" must not read as hybrid.
+_REMOTE_WORDS = r"(?:remote|home[- ]?office|hybrid|mobiles? arbeiten)"
+NO_REMOTE_PATTERN = re.compile(
+    # The negation must govern the keyword: "no remote", "kein Homeoffice", "remote work is not possible"
+    rf"\b(?:no|not|without|kein(?:e|en)?|ohne)\s+(?:option\s+(?:for|of)\s+)?{_REMOTE_WORDS}\b"
+    rf"|\b{_REMOTE_WORDS}(?:\s+(?:work|working|option|arbeit))?\s+(?:is\s+|are\s+|ist\s+)?"
+    r"(?:not\s+(?:possible|available|offered|an\s+option)|nicht\s+möglich)\b",
+    re.IGNORECASE,
+)
+HYBRID_PATTERN = re.compile(
+    r"\bhybrid\b|\bpartially remote\b|\b\d\s?(?:-\s?\d\s?)?days? (?:per week |a week )?(?:in|at|from) (?:the )?office\b"
+    r"|\bmobiles? arbeiten\b|\bhome[- ]?office\b",
+    re.IGNORECASE,
+)
+FULLY_REMOTE_PATTERN = re.compile(
+    r"\b(?:fully|100\s?%|full[- ]time|completely) remote\b|\bremote[- ](?:first|only)\b|\bwork from anywhere\b",
+    re.IGNORECASE,
+)
+ON_SITE_PATTERN = re.compile(r"\bon[- ]?site\b|\bin[- ]office\b|\bvor ort\b", re.IGNORECASE)
+
+TRAVEL_PATTERN = re.compile(
+    r"[^.\n]*\btravel(?:l?ing)?\b[^.\n]*(?:\d+\s?%|\bdays?\b|\bno\b|\bnot\b|\boccasional|\bfrequent|\brequired\b)[^.\n]*",
+    re.IGNORECASE,
+)
+
+LOCATION_LABEL_PATTERN = re.compile(r"\b(?:location|standort|based in|office in|arbeitsort)\b", re.IGNORECASE)
+DEFAULT_CITIES = [
+    "Berlin", "Hamburg", "Munich", "München", "Cologne", "Köln", "Frankfurt", "Frankfurt am Main", "Stuttgart",
+    "Düsseldorf", "Leipzig", "Dortmund", "Essen", "Bremen", "Dresden", "Hannover", "Hanover", "Nuremberg",
+    "Nürnberg", "Duisburg", "Bochum", "Wuppertal", "Bielefeld", "Bonn", "Münster", "Mannheim", "Karlsruhe",
+    "Augsburg", "Wiesbaden", "Aachen", "Kiel", "Freiburg", "Heidelberg", "Darmstadt", "Potsdam", "Regensburg",
+    "Vienna", "Wien", "Graz", "Linz", "Salzburg", "Zurich", "Zürich", "Geneva", "Basel", "Bern", "Lausanne",
+    "Amsterdam", "Rotterdam", "Brussels", "Luxembourg", "Paris", "Lyon", "London", "Manchester", "Edinburgh",
+    "Dublin", "Copenhagen", "Stockholm", "Oslo", "Helsinki", "Warsaw", "Krakow", "Prague", "Budapest", "Madrid",
+    "Barcelona", "Lisbon", "Milan", "Rome", "New York", "San Francisco", "Seattle", "Boston", "Austin", "Chicago",
+    "Los Angeles", "Toronto", "Singapore", "Sydney",
+]
+# Cities that are also common words ("Kostenloses Essen" = free food); these
+# only count on a "Location:"-style line
+AMBIGUOUS_CITIES = {"Essen"}
+
+_location_pattern = None
+
+
+def get_location_pattern():
+    """
+    Compile the city gazetteer into one alternation (longest names first),
+    extended with one city per line from LOCATION_GAZETTEER_PATH if set.
+    """
+    global _location_pattern
+    if _location_pattern is None:
+        cities = list(DEFAULT_CITIES)
+        if config.LOCATION_GAZETTEER_PATH and os.path.exists(config.LOCATION_GAZETTEER_PATH):
+            with open(config.LOCATION_GAZETTEER_PATH, encoding="utf-8") as f:
+                cities.extend(line.strip() for line in f if line.strip())
+        names = sorted(set(cities), key=len, reverse=True)
+        _location_pattern = re.compile(r"\b(?:" + "|".join(re.escape(name) for name in names) + r")\b")
+    return _location_pattern
+
+
+def _find_website(text: str) -> str:
+    for match in URL_PATTERN.finditer(text):
+        url = match.group(0).rstrip(".,;:!?")
+        if not any(domain in url.lower() for domain in JOB_BOARD_DOMAINS):
+            return url
+    return ""
+
+
+def _find_salary(text: str) -> str:
+    for match in SALARY_RANGE_PATTERN.finditer(text):
+        if CURRENCY_PATTERN.search(match.group(0)):
+            return normalize_whitespace(match.group(0))
+    for line in text.splitlines():
+        if SALARY_KEYWORDS.search(line):
+            match = SALARY_SINGLE_PATTERN.search(line)
+            if match:
+                return normalize_whitespace(match.group(0))
+    return ""
+
+
+def _find_remote_policy(text: str) -> str:
+    # Plain "remote" is ambiguous (remote-friendly? fully remote?), so leave it to the LLM
+    negated = NO_REMOTE_PATTERN.search(text) is not None
+    # "no home office" must not count as the hybrid phrase it contains
+    text = NO_REMOTE_PATTERN.sub(" ", text)
+    hybrid = HYBRID_PATTERN.search(text) is not None
+    fully_remote = FULLY_REMOTE_PATTERN.search(text) is not None
+    if negated + hybrid + fully_remote > 1:
+        # Conflicting signals; rule values are final, so let the LLM decide
+        return ""
+    if negated:
+        return "None"
+    if hybrid:
+        return "Partial"
+    if fully_remote:
+        return "Fully Remote"
+    if ON_SITE_PATTERN.search(text):
+        return "None"
+    return ""
+
+
+def _find_location(text: str) -> str:
+    """
+    Prefer a city on a 'Location:'-style line, else the most frequently
+    mentioned one that is not also a common word.
+    """
+    pattern = get_location_pattern()
+    counts = {}
+    for line in text.splitlines():
+        found = pattern.findall(line)
+        if found and LOCATION_LABEL_PATTERN.search(line):
+            return found[0]
+        for city in found:
+            if city not in AMBIGUOUS_CITIES:
+                counts[city] = counts.get(city, 0) + 1
+    return max(counts, key=counts.get) if counts else ""
+
+
+def _find_travel(text: str) -> str:
+    match = TRAVEL_PATTERN.search(text)
+    return normalize_whitespace(match.group(0)) if match else ""
+
+
+RULE_EXTRACTORS = {
+    "company_website": _find_website,
+    "salary_range": _find_salary,
+    "remote_policy": _find_remote_policy,
+    "location": _find_location,
+    "travel_required": _find_travel,
+}
+
+
+def extract_fields_by_rules(text: str, fields: List[str] = AUTOFILL_FIELDS) -> Dict:
+    """Run the pattern/gazetteer extractors for the requested fields; only found values are returned."""
+    found = {}
+    for field in fields:
+        extractor = RULE_EXTRACTORS.get(field)
+        value = extractor(text) if extractor else ""
+        if value:
+            found[field] = value
+    return found
+
+
+# -------------------------
+# LLM Field Extraction
+# -------------------------
+EXTRACTION_PROMPT_TEMPLATE = """
+You are an AI that extracts structured job or company details from the text below.
+Return ONLY valid JSON with these fields:
+{fields}
+
+Text to analyze:
+{text}
+
+Return the JSON object with these keys. If data is not found, use an empty string.
+"""
+
+
+def build_extraction_prompt(text: str, fields: List[str]) -> str:
+    return EXTRACTION_PROMPT_TEMPLATE.format(fields="\n".join(f"- {field}" for field in fields), text=text)
+
+
+def _split_units(text: str, max_tokens: int) -> List[str]:
+    """Split into lines, then sentences, then hard cuts, until each unit fits max_tokens."""
+    units = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if llm_client.estimate_tokens(line) <= max_tokens:
+            units.append(line)
+            continue
+        for sentence in re.split(r"(?<=[.!?;])\s+", line):
+            while llm_client.estimate_tokens(sentence) > max_tokens:
+                head = llm_client.truncate_to_tokens(sentence, max_tokens)
+                units.append(head)
+                sentence = sentence[len(head):]
+            if sentence:
+                units.append(sentence)
+    return units
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Split text into chunks of at most `max_tokens` (estimated), breaking at
+    line and sentence boundaries. Up to `overlap_tokens` of trailing units
+    are repeated at the start of the next chunk so values that straddle a
+    boundary are not lost.
+    """
+    chunks, current, used = [], [], 0
+    for unit in _split_units(text, max_tokens):
+        cost = llm_client.estimate_tokens(unit) + 1
+        if current and used + cost > max_tokens:
+            chunks.append("\n".join(current))
+            carried, carried_cost = [], 0
+            for previous in reversed(current):
+                previous_cost = llm_client.estimate_tokens(previous) + 1
+                if carried_cost + previous_cost > overlap_tokens or carried_cost + previous_cost + cost > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_cost += previous_cost
+            current, used = carried, carried_cost
+        current.append(unit)
+        used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class JsonObjectStream:
+    """
+    Incremental, tolerant parser for the first JSON object in LLM output.
+
+    Text can be fed in arbitrary pieces (e.g. streamed tokens); each
+    top-level "key": value pair is parsed on its own as soon as it is
+    complete, so prose around the object, a malformed pair or an answer cut
+    off by num_predict only loses the affected pairs, not the whole result.
+    """
+
+    def __init__(self):
+        self.pairs: Dict = {}
+        self.complete = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._segment: List[str] = []
+
+    def feed(self, text: str) -> Iterator[Tuple[str, object]]:
+        """Consume more text and yield the (key, value) pairs it completed."""
+        for ch in text:
+            if self.complete:
+                return
+            if not self._started:
+                if ch == "{":
+                    self._started, self._depth, self._segment = True, 1, []
+                continue
+            if self._in_string:
+                self._segment.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+            if self._depth == 0 or (self._depth == 1 and ch == ","):
+                pair = self._parse_pair("".join(self._segment))
+                self._segment = []
+                if pair is not None:
+                    self.pairs[pair[0]] = pair[1]
+                    yield pair
+                if self._depth == 0:
+                    # An object without a single usable pair was prose like "{name}"; keep looking
+                    self.complete = bool(self.pairs)
+                    self._started = False
+                continue
+            self._segment.append(ch)
+
+    @staticmethod
+    def _parse_pair(segment: str) -> Optional[Tuple[str, object]]:
+        segment = segment.strip()
+        if not segment:
+            return None
+        try:
+            data = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            return None
+        return next(iter(data.items())) if len(data) == 1 else None
+
+
+def parse_json_object(response: str) -> Optional[Dict]:
+    """Pairs of the first JSON object in an LLM response (complete or cut off), or None."""
+    parser = JsonObjectStream()
+    for _ in parser.feed(response):
+        pass
+    return parser.pairs or None
+
+
+def _remote_policy_option(value: str) -> str:
+    from functions import REMOTE_POLICY_OPTIONS
+
+    lowered = value.lower()
+    for option in REMOTE_POLICY_OPTIONS:
+        if lowered == option.lower():
+            return option
+    if "hybrid" in lowered or "partial" in lowered:
+        return "Partial"
+    if "remote" in lowered and not re.search(r"\bno\b|\bnot\b", lowered):
+        return "Fully Remote"
+    if re.search(r"on[- ]?site|office|\bno\b|\bnone\b", lowered):
+        return "None"
+    return ""
+
+
+def coerce_field(key: str, value, default):
+    """
+    Coerce an extracted value to the type of the field's session default;
+    returns None when it cannot be used (empty, wrong shape, not an option).
+    """
+    if value is None or isinstance(value, dict):
+        return None
+    if isinstance(default, list):
+        items = re.split(r"[,;\n]", value) if isinstance(value, str) else value
+        if not isinstance(items, list):
+            return None
+        items = [normalize_whitespace(str(item)) for item in items if not isinstance(item, (dict, list))]
+        return [item for item in items if item] or None
+    if isinstance(default, int) and not isinstance(default, bool):
+        try:
+            return int(float(str(value).strip()))
+        except ValueError:
+            return None
+    if isinstance(value, list):
+        value = "\n".join(str(item).strip() for item in value if not isinstance(item, (dict, list)) and str(item).strip())
+    value = str(value).strip()
+    if key == "remote_policy":
+        value = _remote_policy_option(value)
+    return value or None
+
+
+def validate_fields(data: Dict, schema: Dict) -> Dict:
+    """Keep only keys in `schema` (field -> session default) with values coerced to its types."""
+    valid = {}
+    for key, value in data.items():
+        if key in schema:
+            value = coerce_field(key, value, schema[key])
+            if value is not None:
+                valid[key] = value
+    return valid
+
+
+def _as_values(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    value = str(value).strip() if value is not None else ""
+    return [value] if value else []
+
+
+def merge_field_values(results: List[Dict], fields: List[str]) -> Dict:
+    """
+    Merge per-chunk extraction results deterministically (in chunk order):
+    single-valued fields keep the first non-empty value; multi-valued fields
+    keep every distinct value (case-insensitive), as a list for LIST_FIELDS
+    and newline-joined text otherwise. Fields never found are omitted.
+    """
+    merged = {}
+    for field in fields:
+        values, seen = [], set()
+        for result in results:
+            for value in _as_values(result.get(field)):
+                if value.lower() not in seen:
+                    seen.add(value.lower())
+                    values.append(value)
+        if not values:
+            continue
+        if field in MULTI_VALUE_FIELDS:
+            merged[field] = values if field in LIST_FIELDS else "\n".join(values)
+        else:
+            merged[field] = values[0]
+    return merged
+
+
+def extract_fields(text: str, fields: List[str] = AUTOFILL_FIELDS, model: Optional[str] = None,
+                   num_ctx: int = config.AUTOFILL_NUM_CTX, num_predict: int = config.AUTOFILL_NUM_PREDICT,
+                   workers: int = config.AUTOFILL_WORKERS, use_rules: bool = True,
+                   on_field: Optional[Callable[[str, object], None]] = None) -> Tuple[Dict, int]:
+    """
+    Chunk-and-merge JSON extraction: fields the rule-based extractors find
+    are taken as is, the rest of the text is split into chunks that fit the
+    context window next to the prompt and the answer, the chunks are sent to
+    the local LLM concurrently and the parsed results merged. Every value
+    is validated against the field's session default (see validate_fields).
+
+    If `on_field` is given, the answers are streamed and it is called on the
+    calling thread with (field, value) the first time each field is found,
+    so the UI can show values while the rest is still being generated.
+
+    Returns (fields, failed_chunks).
+    """
+    from functions import LLAMA_MODEL, SESSION_DEFAULTS
+
+    schema = {field: SESSION_DEFAULTS.get(field, "") for field in fields}
+    found = extract_fields_by_rules(text, fields) if use_rules else {}
+    reported = set()
+
+    def report(key, value) -> None:
+        if on_field is not None and key not in reported:
+            reported.add(key)
+            on_field(key, value)
+
+    for key, value in found.items():
+        report(key, value)
+    fields = [field for field in fields if field not in found]
+    if not fields:
+        return found, 0
+
+    model = model or LLAMA_MODEL
+    options = {"num_ctx": num_ctx, "num_predict": num_predict}
+    # Constrain the answer to exactly the requested fields so it parses on the first try
+    answer_format = llm_client.json_schema_from_defaults({field: schema[field] for field in fields})
+    budget = num_ctx - num_predict - llm_client.estimate_tokens(build_extraction_prompt("", fields))
+    chunks = chunk_text(text, max(budget, 64), config.AUTOFILL_CHUNK_OVERLAP_TOKENS)
+    if not chunks:
+        return found, 0
+
+    events: "queue.Queue" = queue.Queue()
+
+    def run(chunk: str) -> Optional[Dict]:
+        prompt = build_extraction_prompt(chunk, fields)
+        parser = JsonObjectStream()
+        try:
+            if on_field is None:
+                for _ in parser.feed(llm_client.generate(prompt, model=model, options=options, format=answer_format)):
+                    pass
+            else:
+                for token in llm_client.stream_generate(prompt, model=model, options=options, format=answer_format):
+                    for key, value in parser.feed(token):
+                        value = coerce_field(key, value, schema[key]) if key in schema else None
+                        if value is not None:
+                            events.put((key, value))
+        except (requests.RequestException, ValueError):
+            pass
+        # Whatever was parsed before an error or a cut-off answer is kept
+        return validate_fields(parser.pairs, schema) if parser.pairs else None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        futures = [pool.submit(run, chunk) for chunk in chunks]
+        # Hand streamed values to the callback on this thread until every chunk is done
+        while on_field is not None and not (all(future.done() for future in futures) and events.empty()):
+            try:
+                report(*events.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        results = [future.result() for future in futures]
+    parsed = [result for result in results if result is not None]
+    return {**merge_field_values(parsed, fields), **found}, len(results) - len(parsed)
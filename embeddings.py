@@ -0,0 +1,333 @@
+# embeddings.py
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+# -------------------------
+# Model
+# -------------------------
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model():
+    """Load the SentenceTransformer once per process."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(config.EMBEDDING_MODEL)
+    return _model
+
+
+def _encode(texts: Sequence[str], batch_size: int) -> np.ndarray:
+    vectors = get_embedding_model().encode(
+        list(texts), batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+    )
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def embed_texts(texts: Sequence[str], batch_size: int = 64, use_cache: bool = True) -> np.ndarray:
+    """
+    Embed texts as L2-normalised float32 vectors, so inner product on the
+    index equals cosine similarity. Texts seen before are served from the
+    embedding cache; only the misses go through the model.
+    """
+    texts = list(texts)
+    cache = get_embedding_cache() if use_cache else None
+    if cache is None or not texts:
+        return _encode(texts, batch_size)
+
+    cached = cache.get_many(texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+    if missing:
+        # Encode each distinct missing text once
+        unique = list(dict.fromkeys(texts[i] for i in missing))
+        fresh = _encode(unique, batch_size)
+        cache.put_many(unique, fresh)
+        by_text = dict(zip(unique, fresh))
+        for i in missing:
+            cached[i] = by_text[texts[i]]
+    return np.ascontiguousarray(np.vstack(cached), dtype=np.float32)
+
+# -------------------------
+# Embedding Cache
+# -------------------------
+def normalize_for_cache(text: str) -> str:
+    """Unicode-normalise and collapse whitespace; the model sees the same tokens either way."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Persistent text -> vector cache.
+
+    On disk it is two append-only files: `keys.bin` (16-byte hashes of the
+    normalised text) and `vectors.f32` (one float32 row per key), read back
+    through np.memmap. A bounded in-memory LRU sits in front for the hot
+    entries. Several processes may share a directory: appends happen under
+    an exclusive flock on `cache.lock`, and the row of a new entry is taken
+    from the file size under that lock, never from this process's view.
+    """
+
+    KEY_SIZE = 16
+
+    def __init__(self, directory: str, lru_size: int = 10000):
+        self.directory = directory
+        self.lru_size = lru_size
+        os.makedirs(directory, exist_ok=True)
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, "cache.lock")
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._rows: Dict[bytes, int] = {}
+        self._row_count = 0
+        self._dimension: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        with self._lock, self._file_lock():
+            self._sync()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(normalize_for_cache(text).encode("utf-8"), digest_size=EmbeddingCache.KEY_SIZE).digest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock across processes sharing the directory."""
+        with open(self._lock_path, "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Pick up rows appended since the last sync. Caller holds both locks."""
+        if self._dimension is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path, encoding="utf-8") as f:
+                self._dimension = json.load(f)["dimension"]
+        if not (os.path.exists(self._keys_path) and os.path.exists(self._vectors_path)):
+            return
+        row_bytes = self._dimension * 4
+        keys_size = os.path.getsize(self._keys_path)
+        vectors_size = os.path.getsize(self._vectors_path)
+        rows = min(keys_size // self.KEY_SIZE, vectors_size // row_bytes)
+        # No append is in progress while we hold the file lock, so any
+        # trailing partial entry comes from a crashed writer; cut it off
+        if keys_size != rows * self.KEY_SIZE:
+            os.truncate(self._keys_path, rows * self.KEY_SIZE)
+        if vectors_size != rows * row_bytes:
+            os.truncate(self._vectors_path, rows * row_bytes)
+        if rows <= self._row_count:
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._row_count * self.KEY_SIZE)
+            keys = f.read((rows - self._row_count) * self.KEY_SIZE)
+        for i in range(rows - self._row_count):
+            self._rows.setdefault(keys[i * self.KEY_SIZE:(i + 1) * self.KEY_SIZE], self._row_count + i)
+        self._row_count = rows
+
+    def _vector_at(self, row: int) -> np.ndarray:
+        if self._vectors is None or row >= len(self._vectors):
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r").reshape(-1, self._dimension)
+        return np.array(self._vectors[row])
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        results = []
+        for key in keys:
+            vector = self._lru.get(key)
+            if vector is None and key in self._rows:
+                vector = self._vector_at(self._rows[key])
+            if vector is not None:
+                self._remember(key, vector)
+            results.append(vector)
+        return results
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached vector for each text, or None for misses."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            results = self._lookup(keys)
+            if any(vector is None for vector in results):
+                # Another process may have added them since we last looked
+                with self._file_lock():
+                    self._sync()
+                results = self._lookup(keys)
+        return results
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Append new text/vector pairs; texts already cached are skipped."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._sync()
+            if self._dimension is None:
+                self._dimension = vectors.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dimension": self._dimension, "model": config.EMBEDDING_MODEL}, f)
+            new_keys, new_rows = {}, []
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key not in self._rows and key not in new_keys:
+                    new_keys[key] = len(new_rows)
+                    new_rows.append(vector)
+                self._remember(key, vector)
+            if not new_keys:
+                return
+            first_row = self._row_count
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.vstack(new_rows).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            for key, i in new_keys.items():
+                self._rows[key] = first_row + i
+            self._row_count += len(new_rows)
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache for the configured model, or None if disabled."""
+    global _cache
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _model_lock:
+            if _cache is None:
+                model_dir = re.sub(r"[^A-Za-z0-9_.-]", "_", config.EMBEDDING_MODEL)
+                _cache = EmbeddingCache(os.path.join(config.EMBEDDING_CACHE_DIR, model_dir), config.EMBEDDING_CACHE_LRU_SIZE)
+    return _cache
+
+# -------------------------
+# Batched Corpus Encoding
+# -------------------------
+def _init_worker(threads: int) -> None:
+    """Pin torch to its share of the cores and load the model up front."""
+    import torch
+    torch.set_num_threads(threads)
+    get_embedding_model()
+
+
+def _encode_batch(start: int, texts: List[str]) -> Tuple[int, np.ndarray]:
+    # Workers bypass the embedding cache; corpus vectors go to the memmap instead
+    return start, embed_texts(texts, use_cache=False)
+
+
+def _iter_batches(texts: Iterable[str], batch_size: int) -> Iterator[Tuple[int, List[str]]]:
+    batch, start = [], 0
+    for text in texts:
+        batch.append(text)
+        if len(batch) == batch_size:
+            yield start, batch
+            start += len(batch)
+            batch = []
+    if batch:
+        yield start, batch
+
+
+def embed_to_memmap(texts: Iterable[str], count: int, out_path: str,
+                    batch_size: int = config.EMBEDDING_BATCH_SIZE,
+                    workers: int = config.EMBEDDING_WORKERS,
+                    dtype: str = "float32", report_every: int = 20) -> Dict[str, float]:
+    """
+    Stream `count` texts through the embedding model and write the vectors
+    row by row into a preallocated np.memmap at `out_path`.
+
+    Batches are encoded in a pool of `workers` processes (0 = in this
+    process) with at most 2 batches per worker in flight, so memory stays
+    bounded by the batch size rather than the corpus. Row order matches the
+    input order. `dtype` may be "float32" or "float16". The shape and dtype
+    are written to `out_path + ".json"` for load_embeddings.
+    """
+    if dtype not in ("float32", "float16"):
+        raise ValueError("dtype must be 'float32' or 'float16'")
+
+    vectors = None
+    written = 0
+    started = time.time()
+
+    def store(start: int, batch_vectors: np.ndarray) -> None:
+        nonlocal vectors, written
+        if vectors is None:
+            # The dimension is only known once the first batch comes back
+            vectors = np.memmap(out_path, dtype=dtype, mode="w+", shape=(count, batch_vectors.shape[1]))
+        if start + len(batch_vectors) > count:
+            raise ValueError(f"More than {count} texts supplied")
+        vectors[start:start + len(batch_vectors)] = batch_vectors.astype(dtype, copy=False)
+        written += len(batch_vectors)
+        batches_done = (written + batch_size - 1) // batch_size
+        if report_every and batches_done % report_every == 0:
+            elapsed = time.time() - started
+            print(f"\r{written}/{count} embedded ({written / elapsed:.0f} rows/s)", end="", file=sys.stderr)
+
+    batches = _iter_batches(texts, batch_size)
+    if workers <= 0:
+        for start, batch in batches:
+            store(*_encode_batch(start, batch))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+            in_flight = set()
+            for start, batch in batches:
+                in_flight.add(pool.submit(_encode_batch, start, batch))
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        store(*future.result())
+            for future in in_flight:
+                store(*future.result())
+
+    if vectors is not None:
+        vectors.flush()
+        dimension = vectors.shape[1]
+    else:
+        dimension = 0
+    with open(out_path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"rows": written, "dimension": dimension, "dtype": dtype}, f)
+
+    elapsed = time.time() - started
+    stats = {"rows": written, "seconds": elapsed, "rows_per_sec": written / elapsed if elapsed else 0.0}
+    print(f"\r{written} rows embedded in {elapsed:.1f}s ({stats['rows_per_sec']:.0f} rows/s)", file=sys.stderr)
+    return stats
+
+
+def load_embeddings(path: str, mode: str = "r") -> Optional[np.memmap]:
+    """Open vectors written by embed_to_memmap without reading them into RAM."""
+    with open(path + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    if not meta["rows"]:
+        return None
+    vectors = np.memmap(path, dtype=meta["dtype"], mode=mode)
+    return vectors[:meta["rows"] * meta["dimension"]].reshape(meta["rows"], meta["dimension"])
@@ -1 +1,304 @@
-#faiss_integration.py
+# faiss_integration.py
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import faiss
+import numpy as np
+
+import config
+from embeddings import embed_texts
+
+INDEX_FILE = "index.faiss"
+DOCUMENTS_FILE = "documents.sqlite"
+LEGACY_DOCUMENTS_FILE = "documents.jsonl"
+
+# -------------------------
+# Index Construction
+# -------------------------
+def create_index(dimension: int, num_vectors: int, kind: str = "auto") -> "faiss.Index":
+    """
+    Create an empty inner-product index.
+
+    kind: "flat" (exact, small corpora), "hnsw" (graph, no training),
+    "ivf" (inverted lists, needs training) or "auto", which picks flat up to
+    config.FAISS_FLAT_MAX vectors and HNSW above that.
+    """
+    if kind == "auto":
+        kind = "flat" if num_vectors <= config.FAISS_FLAT_MAX else "hnsw"
+
+    if kind == "flat":
+        return faiss.IndexFlatIP(dimension)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = config.FAISS_HNSW_EF_SEARCH
+        return index
+    if kind == "ivf":
+        # ~4*sqrt(N) lists, but never more than the vectors we can train on
+        nlist = max(1, min(int(4 * np.sqrt(max(num_vectors, 1))), num_vectors // 39 or 1))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = min(config.FAISS_IVF_NPROBE, nlist)
+        return index
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def _tune_for_search(index: "faiss.Index") -> None:
+    """Re-apply search-time parameters, which are not persisted with the index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.FAISS_IVF_NPROBE, ivf.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.FAISS_HNSW_EF_SEARCH
+
+
+class DocumentStore:
+    """
+    Row -> document dict in SQLite, read per search hit instead of being
+    loaded at startup. Superseded rows hold NULL. Appends and stale marks
+    are written in place, so saving an index never rewrites all documents.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS documents (row INTEGER PRIMARY KEY, doc TEXT)")
+        self.conn.commit()
+
+    def get_many(self, rows: Sequence[int]) -> Dict[int, Optional[Dict]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(rows), 500):
+                batch = list(rows[start:start + 500])
+                placeholders = ",".join("?" * len(batch))
+                for row, doc in self.conn.execute(f"SELECT row, doc FROM documents WHERE row IN ({placeholders})", batch):
+                    found[row] = json.loads(doc) if doc is not None else None
+        return found
+
+    def iter_documents(self, rows: int, chunk: int = 10000) -> Iterator[Optional[Dict]]:
+        """Documents of rows 0..rows-1 in order, read in chunks."""
+        for start in range(0, rows, chunk):
+            found = self.get_many(range(start, min(start + chunk, rows)))
+            for row in range(start, min(start + chunk, rows)):
+                yield found.get(row)
+
+    def stale_count(self, rows: int) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents WHERE doc IS NULL AND row < ?", (rows,)).fetchone()[0]
+
+    def write(self, first_row: int, documents: Iterable[Optional[Dict]], stale: Iterable[int] = (),
+              replace_all: bool = False) -> None:
+        """Store documents from `first_row` on and NULL the `stale` rows, in one transaction."""
+        encoded = ((first_row + i, None if doc is None else json.dumps(doc, ensure_ascii=False))
+                   for i, doc in enumerate(documents))
+        with self._lock, self.conn:
+            if replace_all:
+                self.conn.execute("DELETE FROM documents")
+            # Replace: rows past the index of an interrupted save are written again
+            self.conn.executemany("INSERT OR REPLACE INTO documents (row, doc) VALUES (?, ?)", encoded)
+            self.conn.executemany("UPDATE documents SET doc = NULL WHERE row = ?", ((row,) for row in stale))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class VectorIndex:
+    """
+    A FAISS index together with the documents it was built from.
+    Row i of the index corresponds to document i; rows superseded by a
+    re-ingested record hold None and are skipped by search. Saved documents
+    live in a DocumentStore; rows added or marked stale since the last save
+    are kept in memory until the next one.
+    """
+
+    def __init__(self, index: "faiss.Index", documents: List[Optional[Dict]], store: Optional[DocumentStore] = None):
+        self.index = index
+        self.store = store
+        # Rows [0, _stored) are in the store, the rest in _new
+        self._stored = index.ntotal - len(documents)
+        self._new = documents
+        self._stale: Set[int] = set()
+        stored_stale = store.stale_count(self._stored) if store is not None else 0
+        self.stale_count = stored_stale + sum(1 for doc in documents if doc is None)
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, documents: List[Dict], kind: str = "auto") -> "VectorIndex":
+        """Build an index over precomputed (normalised) embeddings."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(embeddings) != len(documents):
+            raise ValueError("embeddings and documents must have the same length")
+        index = create_index(embeddings.shape[1], len(embeddings), kind)
+        if not index.is_trained:
+            index.train(embeddings)
+        vector_index = cls(index, [])
+        vector_index.add(embeddings, documents)
+        return vector_index
+
+    def rebuild(self, kind: str = "auto") -> "VectorIndex":
+        """
+        Re-create the index for its current size, e.g. a flat index that has
+        outgrown config.FAISS_FLAT_MAX. Needs an index that can return its
+        vectors (flat or HNSW); documents and stale rows are carried over.
+        """
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        index = create_index(self.index.d, self.index.ntotal, kind)
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        rebuilt = VectorIndex(index, list(self._new), self.store)
+        rebuilt._stale = set(self._stale)
+        rebuilt.stale_count = self.stale_count
+        return rebuilt
+
+    def add(self, embeddings: np.ndarray, documents: List[Dict]) -> None:
+        """Append vectors and their documents."""
+        if len(embeddings) != len(documents):
+            raise ValueError("embeddings and documents must have the same length")
+        if len(embeddings):
+            self.index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+            self._new.extend(documents)
+
+    def documents(self, rows: Sequence[int]) -> List[Optional[Dict]]:
+        """The documents of `rows` (None for stale rows), reading saved ones from the store."""
+        saved = [row for row in rows if row < self._stored and row not in self._stale]
+        found = self.store.get_many(saved) if saved and self.store is not None else {}
+        return [self._new[row - self._stored] if row >= self._stored else found.get(row) for row in rows]
+
+    def mark_stale(self, rows: Sequence[int]) -> None:
+        """Hide rows whose record has been replaced by a newer vector."""
+        for row, doc in zip(rows, self.documents(rows)):
+            if doc is None:
+                continue
+            if row >= self._stored:
+                self._new[row - self._stored] = None
+            else:
+                self._stale.add(row)
+            self.stale_count += 1
+
+    def search(self, query_vectors: np.ndarray, k: int = 5) -> List[List[Dict]]:
+        """
+        Return, per query vector, up to k documents with a "score"
+        (cosine similarity), best first.
+        """
+        query_vectors = np.ascontiguousarray(np.atleast_2d(query_vectors), dtype=np.float32)
+        if self.index.ntotal == 0:
+            return [[] for _ in range(len(query_vectors))]
+        # Over-fetch so stale rows do not eat into the k results
+        fetch = min(k + min(self.stale_count, k), self.index.ntotal)
+        scores, ids = self.index.search(query_vectors, fetch)
+        hit_rows = sorted({int(i) for i in ids.ravel() if i != -1})
+        by_row = dict(zip(hit_rows, self.documents(hit_rows)))
+        results = []
+        for row_scores, row_ids in zip(scores, ids):
+            hits = [
+                {**by_row[int(i)], "score": float(s)}
+                for s, i in zip(row_scores, row_ids) if i != -1 and by_row[int(i)] is not None
+            ]
+            results.append(hits[:k])
+        return results
+
+    def save(self, directory: str = config.FAISS_INDEX_DIR) -> None:
+        """
+        Persist the index and its documents. The documents are committed
+        first and the index file is then replaced atomically; store rows
+        beyond the index are ignored on load and overwritten on the next save.
+        """
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, INDEX_FILE)
+        docs_path = os.path.join(directory, DOCUMENTS_FILE)
+
+        faiss.write_index(self.index, index_path + ".tmp")
+        if self.store is not None and os.path.abspath(self.store.path) == os.path.abspath(docs_path):
+            self.store.write(self._stored, self._new, self._stale)
+        else:
+            store = DocumentStore(docs_path)
+            documents = self.store.iter_documents(self._stored) if self.store is not None else iter(())
+            stale = self._stale
+            store.write(0, itertools.chain((None if row in stale else doc for row, doc in enumerate(documents)),
+                                           self._new), replace_all=True)
+            self.store = store
+        self._stored = self.index.ntotal
+        self._new = []
+        self._stale = set()
+        os.replace(index_path + ".tmp", index_path)
+
+    @classmethod
+    def load(cls, directory: str = config.FAISS_INDEX_DIR, mmap: bool = True) -> "VectorIndex":
+        """
+        Load a saved index. Documents stay in the store and are read per
+        hit. With mmap=True, faiss memory-maps what its index type allows
+        (the inverted lists of IVF indexes); flat and HNSW vectors are
+        still read into RAM, so their startup cost grows with the corpus.
+        """
+        index_path = os.path.join(directory, INDEX_FILE)
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+        except RuntimeError:
+            # Not every index type supports mmap; fall back to a regular read
+            index = faiss.read_index(index_path)
+        _tune_for_search(index)
+        docs_path = os.path.join(directory, DOCUMENTS_FILE)
+        legacy_path = os.path.join(directory, LEGACY_DOCUMENTS_FILE)
+        if not os.path.exists(docs_path) and os.path.exists(legacy_path):
+            _import_legacy_documents(legacy_path, docs_path)
+        return cls(index, [], DocumentStore(docs_path))
+
+
+def _import_legacy_documents(legacy_path: str, docs_path: str) -> None:
+    """One-off conversion of a documents.jsonl written by older versions."""
+    store = DocumentStore(docs_path + ".tmp")
+    with open(legacy_path, encoding="utf-8") as f:
+        store.write(0, (json.loads(line) for line in f if line.strip()), replace_all=True)
+    store.conn.execute("PRAGMA journal_mode=DELETE")
+    store.close()
+    os.replace(docs_path + ".tmp", docs_path)
+
+# -------------------------
+# Service API
+# -------------------------
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def build_index(texts: Sequence[str], metadata: Optional[List[Dict]] = None, kind: str = "auto",
+                directory: Optional[str] = config.FAISS_INDEX_DIR) -> VectorIndex:
+    """
+    Embed texts, build an index over them and (unless directory is None)
+    save it. Each document stores its text plus the optional metadata.
+    """
+    metadata = metadata or [{} for _ in texts]
+    documents = [{**meta, "text": text} for text, meta in zip(texts, metadata)]
+    vector_index = VectorIndex.build(embed_texts(texts), documents, kind)
+    if directory is not None:
+        vector_index.save(directory)
+        with _indexes_lock:
+            _indexes[directory] = vector_index
+    return vector_index
+
+
+def get_index(directory: str = config.FAISS_INDEX_DIR) -> Optional[VectorIndex]:
+    """Return the saved index for this directory (loaded once per process), or None."""
+    if directory not in _indexes:
+        with _indexes_lock:
+            if directory not in _indexes:
+                if not os.path.exists(os.path.join(directory, INDEX_FILE)):
+                    return None
+                _indexes[directory] = VectorIndex.load(directory)
+    return _indexes[directory]
+
+
+def search(query: str, k: int = 5, directory: str = config.FAISS_INDEX_DIR) -> List[Dict]:
+    """Return the k documents most similar to the query text."""
+    vector_index = get_index(directory)
+    if vector_index is None:
+        return []
+    return vector_index.search(embed_texts([query]), k)[0]
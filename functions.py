@@ -2,8 +2,21 @@
 
 import streamlit as st
 import requests
+import copy
+import hashlib
+import io
 import json
-import re
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import config
+import llm_client
+from cache_store import LRUCache, SQLiteCache, make_key
+from url_fetcher import fetch_urls_sync
+from data_extraction import extract_main_text
 from PyPDF2 import PdfReader
 from docx import Document
 
@@ -16,58 +29,160 @@ def store_in_state(key, value):
 def get_from_session_state(key, default=None):
     return st.session_state.get(key, default)
 
+# Options of the remote work policy selectbox; extracted values are mapped onto these
+REMOTE_POLICY_OPTIONS = ["None", "Partial", "Fully Remote"]
+
+SESSION_DEFAULTS = {
+    "job_title": "",
+    "company_name": "",
+    "location": "",
+    "company_website": "",
+    "industry": "",
+    "company_size": "",
+    "founded_year": 0,
+    "company_mission": "",
+    "department": "",
+    "team_size": 0,
+    "direct_supervisor": "",
+    "department_goals": "",
+    "technologies_used": [],
+    "travel_required": "",
+    "remote_policy": "",
+    "job_reason": "New Role",
+    "responsibility_distribution": "",
+    "tasks": "",
+    "job_challenges": "",
+    "recurring_tasks": "",
+    "autonomy_level": "Low",
+    "hard_skills": "",
+    "soft_skills": "",
+    "salary_range": "",
+    "benefits": "",
+    "health_benefits": "",
+    "learning_opportunities": "",
+    "interview_stages": 0,
+    "uploaded_file": {},
+    "input_url": "",
+    "current_section": 0
+}
+
 def initialize_session_state():
     """
     Prepopulates certain fields so we avoid KeyErrors.
     """
-    defaults = {
-        "job_title": "",
-        "company_name": "",
-        "location": "",
-        "company_website": "",
-        "industry": "",
-        "company_size": "",
-        "founded_year": 0,
-        "company_mission": "",
-        "department": "",
-        "team_size": 0,
-        "direct_supervisor": "",
-        "department_goals": "",
-        "technologies_used": [],
-        "travel_required": "",
-        "remote_policy": "",
-        "job_reason": "New Role",
-        "responsibility_distribution": "",
-        "tasks": "",
-        "job_challenges": "",
-        "recurring_tasks": "",
-        "autonomy_level": "Low",
-        "hard_skills": "",
-        "soft_skills": "",
-        "salary_range": "",
-        "benefits": "",
-        "health_benefits": "",
-        "learning_opportunities": "",
-        "interview_stages": 0,
-        "uploaded_file": {},
-        "input_url": "",
-        "current_section": 0
-    }
-    for k, v in defaults.items():
+    for k, v in SESSION_DEFAULTS.items():
         if k not in st.session_state:
-            st.session_state[k] = v
+            st.session_state[k] = copy.deepcopy(v)
 
 # -------------------------
 # File / Text Extraction
 # -------------------------
-def extract_text_from_pdf(file):
-    reader = PdfReader(file)
+PdfPage = namedtuple("PdfPage", ["number", "total", "text", "seconds"])
+
+def _extract_page_range(data, start, stop):
+    """Worker: extract pages [start, stop) from the raw PDF bytes."""
+    reader = PdfReader(io.BytesIO(data))
+    pages = []
+    for index in range(start, stop):
+        t0 = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        pages.append(PdfPage(index + 1, len(reader.pages), text, time.perf_counter() - t0))
+    return pages
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool(workers):
+    """
+    Process-wide pool for PDF extraction, created on first use. Workers come
+    from forkserver (spawn where unavailable): forking the multi-threaded
+    Streamlit server could copy locks held by other threads. The forkserver
+    imports this module once, so new workers start without re-importing it.
+    """
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pdf_pool
+
+def iter_pdf_pages(file, max_chars=0, workers=0, pages_per_task=None):
+    """
+    Yield PdfPage(number, total, text, seconds) in page order as soon as
+    each page is extracted. Stops once `max_chars` characters were yielded
+    (0 = no limit). With workers > 0, PDFs of at least
+    config.PDF_PARALLEL_MIN_PAGES pages are split into page ranges that are
+    extracted in the shared process pool, keeping at most 2 ranges per
+    worker ahead, while this process extracts the first range itself. By
+    default there is one range per worker, so each worker receives and
+    parses the document once.
+    """
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    reader = PdfReader(io.BytesIO(data))
+    total_pages = len(reader.pages)
+    extracted = 0
+
+    # This process extracts too, so more workers than the remaining cores only add overhead
+    workers = min(workers, (os.cpu_count() or 1) - 1)
+    if workers <= 0 or total_pages < config.PDF_PARALLEL_MIN_PAGES:
+        for index, page in enumerate(reader.pages):
+            t0 = time.perf_counter()
+            text = page.extract_text() or ""
+            yield PdfPage(index + 1, total_pages, text, time.perf_counter() - t0)
+            extracted += len(text)
+            if max_chars and extracted >= max_chars:
+                return
+        return
+
+    pages_per_task = pages_per_task or -(-total_pages // (workers + 1))
+    ranges = [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+    pool = _get_pdf_pool(workers)
+    pending = [pool.submit(_extract_page_range, data, *r) for r in ranges[1:2 * workers + 1]]
+    next_range = len(pending) + 1
+    try:
+        # The first pages come from the reader we already have, without waiting for a worker
+        for index in range(*ranges[0]):
+            t0 = time.perf_counter()
+            text = reader.pages[index].extract_text() or ""
+            yield PdfPage(index + 1, total_pages, text, time.perf_counter() - t0)
+            extracted += len(text)
+            if max_chars and extracted >= max_chars:
+                return
+        while pending:
+            pages = pending.pop(0).result()
+            if next_range < len(ranges):
+                pending.append(pool.submit(_extract_page_range, data, *ranges[next_range]))
+                next_range += 1
+            for page in pages:
+                yield page
+                extracted += len(page.text)
+                if max_chars and extracted >= max_chars:
+                    return
+    finally:
+        for future in pending:
+            future.cancel()
+
+def extract_text_from_pdf(file, max_chars=None, workers=None, on_page=None):
+    """
+    Extract the text of a PDF page by page, stopping at `max_chars`
+    (default config.PDF_MAX_CHARS). `on_page` is called with every PdfPage,
+    e.g. to update a progress bar.
+    """
+    max_chars = config.PDF_MAX_CHARS if max_chars is None else max_chars
+    workers = config.PDF_WORKERS if workers is None else workers
     txt = []
-    for page in reader.pages:
-        text = page.extract_text()
-        if text:
-            txt.append(text)
-    return {"job_description": " ".join(txt)}
+    for page in iter_pdf_pages(file, max_chars=max_chars, workers=workers):
+        if on_page:
+            on_page(page)
+        if page.text:
+            txt.append(page.text)
+    text = " ".join(txt)
+    return {"job_description": text[:max_chars] if max_chars else text}
 
 def extract_text_from_docx(file):
     doc = Document(file)
@@ -79,51 +194,94 @@ def extract_text_from_docx(file):
 def extract_text_from_txt(file):
     return {"job_description": file.read().decode("utf-8", errors="ignore")}
 
-def process_uploaded_file(uploaded_file):
-    if not uploaded_file:
-        return {"job_description": ""}
-    ext = uploaded_file.name.split(".")[-1].lower()
+_extraction_memory = LRUCache(config.EXTRACTION_CACHE_LRU_SIZE)
+_extraction_disk = None
+
+def _get_extraction_disk_cache():
+    global _extraction_disk
+    if _extraction_disk is None:
+        _extraction_disk = SQLiteCache(config.EXTRACTION_CACHE_PATH, max_bytes=config.EXTRACTION_CACHE_MAX_BYTES)
+    return _extraction_disk
+
+def extract_text_from_bytes(data, ext, on_page=None, max_chars=None, workers=None):
+    """
+    Run the extractor matching the file extension on raw file bytes.
+    `max_chars`/`workers` are passed on to extract_text_from_pdf.
+    """
     if ext == "pdf":
-        return extract_text_from_pdf(uploaded_file)
+        return extract_text_from_pdf(io.BytesIO(data), max_chars=max_chars, workers=workers, on_page=on_page)
     elif ext == "docx":
-        return extract_text_from_docx(uploaded_file)
+        return extract_text_from_docx(io.BytesIO(data))
     elif ext == "txt":
-        return extract_text_from_txt(uploaded_file)
+        return extract_text_from_txt(io.BytesIO(data))
     else:
         return {"job_description": f"Unsupported format: {ext}"}
 
+def process_uploaded_file(uploaded_file, on_page=None):
+    """
+    Extract the text of an uploaded file. Results are cached by the SHA-256
+    of the file bytes (in memory, then on disk), so reruns and re-uploads of
+    the same document skip parsing.
+    """
+    if not uploaded_file:
+        return {"job_description": ""}
+    ext = uploaded_file.name.split(".")[-1].lower()
+    if ext not in ("pdf", "docx", "txt"):
+        return {"job_description": f"Unsupported format: {ext}"}
+
+    data = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+    key = make_key("upload", hashlib.sha256(data).hexdigest(), ext, config.PDF_MAX_CHARS)
+
+    result = _extraction_memory.get(key)
+    if result is not None:
+        return result
+    disk = _get_extraction_disk_cache()
+    cached = disk.get_text(key)
+    if cached is not None:
+        result = json.loads(cached)
+    else:
+        result = extract_text_from_bytes(data, ext, on_page=on_page)
+        disk.set_text(key, json.dumps(result))
+    _extraction_memory.set(key, result)
+    return result
+
 def extract_content_from_url(url):
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        clean_text = re.sub(r"<.*?>", "", resp.text)  # strip HTML tags
-        return clean_text
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error fetching URL: {e}")
+    """
+    Fetch a page through the shared URL fetcher (HTTP cache, body size
+    limit) and return the text of its main content (see extract_main_text).
+    """
+    result = fetch_urls_sync([url])[0]
+    if result["error"]:
+        st.error(f"Error fetching URL: {result['error']}")
         return ""
+    return extract_main_text(result["text"])
 
 # -------------------------
 # LLM Integration
 # -------------------------
-OLLAMA_API_URL = "http://127.0.0.1:11434/api/generate"
+LLAMA_MODEL = "llama2:7b"
+LLAMA_OPTIONS = {
+    "num_ctx": 512,
+    "num_predict": 256
+}
 
 def fetch_from_llama(prompt):
     """
     Example call to a local LLaMA model via Ollama.
     Adjust 'model' or parameters as needed.
     """
-    payload = {
-        "model": "llama2:7b",
-        "prompt": prompt,
-        "num_ctx": 512,
-        "num_predict": 256,
-        "stream": False
-    }
     try:
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=120)
-        response.raise_for_status()
-        data = json.loads(response.text)
-        return data.get("response", "No valid response.")
-    except requests.exceptions.RequestException as e:
+        return llm_client.generate(prompt, model=LLAMA_MODEL, options=LLAMA_OPTIONS, timeout=120) or "No valid response."
+    except (requests.exceptions.RequestException, ValueError) as e:
         st.error(f"Error contacting LLM: {e}")
         return ""
+
+def stream_from_llama(prompt):
+    """
+    Streaming counterpart of fetch_from_llama: yields tokens as the local
+    LLaMA model produces them, so the UI can render text immediately.
+    """
+    try:
+        yield from llm_client.stream_generate(prompt, model=LLAMA_MODEL, options=LLAMA_OPTIONS, timeout=120)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(f"Error contacting LLM: {e}")
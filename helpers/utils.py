@@ -3,25 +3,16 @@ import re
 import requests
 import json
 import streamlit as st
-from typing import List, Dict, Optional
+import llm_client
+from skill_normalizer import normalize_skills, split_skill_lines
+from skill_taxonomy import DEFAULT_SKILL_CATEGORY, get_classifier
+from typing import Callable, List, Dict, Optional
 from pathlib import Path
 
 # Function to query the Groq API with enhanced error handling and debugging
 def query_groq_model(prompt, model_name="llama3-8b-8192"):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {groq_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": model_name,
-        "messages": [{"role": "user", "content": prompt}]
-    }
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()  # Raises an HTTPError for bad responses
-        response_data = response.json()
-        return response_data["choices"][0]["message"]["content"]
+        return llm_client.chat_completion(prompt, model=model_name)
     except requests.exceptions.HTTPError as http_err:
         st.error(f"HTTP error occurred: {http_err}")
     except requests.exceptions.RequestException as req_err:
@@ -30,52 +21,6 @@ def query_groq_model(prompt, model_name="llama3-8b-8192"):
         st.error(f"JSON decode error: {json_err}")
     return None
 
-# Query Functions
-@st.cache_data
-def cached_generate_role_skills(role: str) -> Dict[str, List[str]]:
-    """Generate and cache skills for a specific role."""
-    if not role:
-        return {"Error": ["No role specified."]}
-
-    categories = {
-        "Programming Languages": [],
-        "Libraries": [],
-        "Soft Skills": [],
-        "Technical Skills": [],
-        "Management Skills": [],
-        "Analytical Skills": [],
-        "Tools/Technologies": []
-    }
-
-    prompt = (
-        f"You are an expert HR consultant. For the role '{role}', list as keywords with no further explanation the top 5 Programming Languages, "
-        f"top 15 Libraries, and top 10 Soft Skills, along with other skills categorized as "
-        f"Technical Skills, Management Skills, Analytical Skills, and Tools/Technologies."
-    )
-
-    skills_response = query_local_llm(prompt)
-    skills = [skill.strip() for skill in skills_response.split("\n") if skill.strip()]
-    
-    predefined_keywords = {
-        "Programming Languages": ["Python", "Java", "C++", "JavaScript", "SQL"],
-        "Libraries": ["TensorFlow", "PyTorch", "Scikit-learn", "Pandas", "NumPy"],
-        "Soft Skills": ["communication", "teamwork", "adaptability", "problem-solving"],
-        "Technical Skills": ["programming", "coding", "cloud", "networking", "engineering"],
-        "Management Skills": ["leadership", "planning", "strategy", "risk management"],
-        "Analytical Skills": ["data", "analysis", "decision-making", "quantitative"],
-        "Tools/Technologies": ["Excel", "Tableau", "Power BI", "SQL", "Python"]
-    }
-
-    # Categorize skills into predefined sections
-    for skill in skills:
-        for category, keywords in predefined_keywords.items():
-            if any(keyword.lower() in skill.lower() for keyword in keywords):
-                if len(categories[category]) < 15:  # Allow up to 15 items
-                    categories[category].append(skill)
-                break
-
-    return categories
-
 def role_info_page(role: str):
     """Render the Role Information page with sliders for skill intensity."""
     skills_categories = cached_generate_role_skills(role)
@@ -163,28 +108,21 @@ def generate_interview_preparation_sheet(data: Dict[str, any]) -> str:
 
     return preparation_sheet
 
-def query_local_llm(prompt: str, model: str = "koesn/dolphin-llama3-8b", num_ctx: int = 8192) -> str:
-    """Query a local LLM server to generate a response as keywords with no further explanation based on a prompt."""
-    url = "http://127.0.0.1:11434/api/generate"
-    headers = {"Content-Type": "application/json"}
-    payload = {"model": model, "prompt": prompt, "num_ctx": num_ctx}
+def query_local_llm_raw(prompt: str, model: str = "koesn/dolphin-llama3-8b", num_ctx: int = 8192, format=None) -> str:
+    """Like query_local_llm, but raises instead of reporting errors in the UI (safe off the script thread)."""
+    return llm_client.generate(prompt, model=model, options={"num_ctx": num_ctx}, format=format).strip()
 
+def query_local_llm(prompt: str, model: str = "koesn/dolphin-llama3-8b", num_ctx: int = 8192, format=None) -> str:
+    """
+    Query a local LLM server to generate a response as keywords with no further explanation based on a prompt.
+    `format` ("json" or a JSON schema) constrains the answer, see llm_client.generate.
+    """
     try:
-        response = requests.post(url, headers=headers, json=payload, stream=True)
-        response.raise_for_status()
-
-        generated_text = ""
-        for line in response.iter_lines():
-            if line:
-                data = json.loads(line.decode("utf-8"))
-                generated_text += data.get("response", "")
-                if data.get("done", False):
-                    break
-        return generated_text.strip()
+        return query_local_llm_raw(prompt, model=model, num_ctx=num_ctx, format=format)
     except requests.RequestException as e:
         st.error(f"Error connecting to the LLM server: {e}")
         return ""
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         st.error(f"Error decoding LLM response: {e}")
         return ""
 def user_model_query(prompt):
@@ -203,10 +141,126 @@ def query_remote_api(prompt: str, api_key: str, timeout: int = 15) -> str:
     st.info("Remote API integration not yet implemented.")
     return ""
 
-def query_rag(prompt: str, api_key: str, retrieval_count: int = 5, confidence_threshold: float = 0.5) -> str:
-    """Query a Retrieval-Augmented Generation (RAG) API."""
-    st.info("RAG integration not yet implemented.")
-    return ""
+RAG_PROMPT_TEMPLATE = (
+    "You are an expert HR consultant. Use the reference material below where it is relevant.\n\n"
+    "Reference material:\n{context}\n\n"
+    "Task:\n{prompt}"
+)
+
+def pack_context(passages: List[str], max_tokens: int) -> str:
+    """Greedily pack passages (best first) into a context of at most max_tokens."""
+    packed = []
+    used = 0
+    for passage in passages:
+        block = f"- {passage.strip()}\n"
+        cost = llm_client.estimate_tokens(block)
+        if used + cost > max_tokens:
+            continue
+        packed.append(block)
+        used += cost
+    return "".join(packed)
+
+def query_rag(prompt: str, api_key: str = "", retrieval_count: int = 5, confidence_threshold: float = 0.5,
+              model: str = "koesn/dolphin-llama3-8b", num_ctx: int = 8192, reserve_tokens: int = 512) -> str:
+    """
+    Query the local LLM with Retrieval-Augmented Generation (RAG).
+
+    The prompt is embedded and matched against the local FAISS index; up to
+    `retrieval_count` neighbours with a cosine similarity of at least
+    `confidence_threshold` are packed into the prompt, leaving
+    `reserve_tokens` of the `num_ctx` window for the answer.
+    """
+    # Keep the bare prompt inside the window, whatever the retrieval finds
+    prompt = llm_client.truncate_to_tokens(prompt, num_ctx - reserve_tokens)
+
+    try:
+        import faiss_integration
+        neighbours = faiss_integration.search(prompt, k=retrieval_count)
+    except Exception as e:
+        st.warning(f"Vector search unavailable, answering without context: {e}")
+        neighbours = []
+
+    passages = [doc["text"] for doc in neighbours if doc.get("score", 0.0) >= confidence_threshold]
+    budget = num_ctx - reserve_tokens - llm_client.estimate_tokens(RAG_PROMPT_TEMPLATE.format(context="", prompt=prompt))
+    context = pack_context(passages, budget)
+    if not context:
+        return query_local_llm(prompt, model=model, num_ctx=num_ctx)
+
+    return query_local_llm(RAG_PROMPT_TEMPLATE.format(context=context, prompt=prompt), model=model, num_ctx=num_ctx)
+
+# Combined Role Profile
+ROLE_PROFILE_SECTIONS = ("skills", "benefits", "recruitment_steps")
+ROLE_PROFILE_SCHEMA = llm_client.string_list_schema(list(ROLE_PROFILE_SECTIONS))
+KEYWORD_LIST_SCHEMA = llm_client.string_list_schema(["items"])
+
+def _clean_list(items) -> List[str]:
+    """Keep non-empty string items, stripped."""
+    if not isinstance(items, list):
+        return []
+    return [str(item).strip() for item in items if str(item).strip()]
+
+def query_local_list(prompt: str) -> List[str]:
+    """Ask the local LLM for a keyword list, constrained to a {"items": [...]} JSON object."""
+    response = query_local_llm(
+        prompt + '\nReturn ONLY a JSON object of the form {"items": [...]} with one string per keyword.',
+        format=KEYWORD_LIST_SCHEMA,
+    )
+    try:
+        data = json.loads(response)
+        return _clean_list(data.get("items")) if isinstance(data, dict) else []
+    except json.JSONDecodeError:
+        # A server without format support may still answer with one keyword per line
+        return split_skill_lines(response.split("\n"))
+
+def generate_role_profile(role: str, query: Callable[..., str] = None) -> Dict[str, List[str]]:
+    """
+    Generate skills, benefits and recruitment steps for a role in a single
+    LLM round-trip, constrained by ROLE_PROFILE_SCHEMA. Sections that could
+    not be parsed come back empty. `query` defaults to query_local_llm and
+    must accept a `format` keyword.
+    """
+    query = query or query_local_llm
+    profile = {section: [] for section in ROLE_PROFILE_SECTIONS}
+    if not role:
+        return profile
+
+    prompt = (
+        f"You are an expert HR consultant. For the role '{role}', return ONLY a JSON object with these keys:\n"
+        '- "skills": keywords with no further explanation for the top 5 Programming Languages, top 15 Libraries, '
+        "top 10 Soft Skills and other Technical Skills, Management Skills, Analytical Skills and Tools/Technologies\n"
+        '- "benefits": up to 10 benefits as keywords that would attract candidates, each described with less than 5 words\n'
+        '- "recruitment_steps": up to 10 ideal steps for the recruitment process as keywords\n'
+        "Every value must be a JSON array of strings."
+    )
+
+    response = query(prompt, format=ROLE_PROFILE_SCHEMA)
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return profile
+    try:
+        data = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return profile
+    if not isinstance(data, dict):
+        return profile
+
+    for section in ROLE_PROFILE_SECTIONS:
+        profile[section] = _clean_list(data.get(section))
+    return profile
+
+@st.cache_data
+def cached_generate_role_profile(role: str) -> Dict[str, List[str]]:
+    """
+    Generate and cache the combined role profile (see generate_role_profile).
+    Besides st.cache_data (per process) the profile is kept in the shared
+    LLM cache, so replicas asking for the same role generate it only once.
+    """
+    def generate() -> Optional[Dict[str, List[str]]]:
+        profile = generate_role_profile(role)
+        # An all-empty profile means the generation failed; don't share it
+        return profile if any(profile.values()) else None
+
+    return llm_client.shared_json("role_profile", [role], generate) or {section: [] for section in ROLE_PROFILE_SECTIONS}
 
 # Skill and Summary Generators
 @st.cache_data
@@ -216,16 +270,6 @@ def cached_generate_role_skills(role: str) -> Dict[str, List[str]]:
         st.warning("Role is empty. Please provide a valid job role.")
         return {"Error": ["No role specified."]}
 
-    categories = {
-        "Programming Languages": [],
-        "Libraries": [],
-        "Soft Skills": [],
-        "Technical Skills": [],
-        "Management Skills": [],
-        "Analytical Skills": [],
-        "Tools/Technologies": []
-    }
-
     # Updated prompt to align with specific categories
     prompt = (
         f"You are an expert HR consultant. For the role '{role}', list as keywords with no further explanation the top 5 Programming Languages, "
@@ -234,36 +278,17 @@ def cached_generate_role_skills(role: str) -> Dict[str, List[str]]:
     )
 
     try:
-        skills_response = query_local_llm(prompt)
-        if not isinstance(skills_response, str) or len(skills_response.strip()) == 0:
-            raise ValueError("Invalid or empty LLM response.")
-
-        skills = [skill.strip() for skill in skills_response.split("\n") if skill.strip()]
+        # Served from the combined role profile; only fall back to a dedicated call if that section is empty
+        skills = cached_generate_role_profile(role)["skills"]
+        if not skills:
+            skills = query_local_list(prompt)
+        # Merge bullets, casing variants, aliases and near-duplicates before caching
+        skills = normalize_skills(skills)
         if not skills:
             raise ValueError("Empty skill list generated.")
 
-        predefined_keywords = {
-            "Programming Languages": ["Python", "Java", "C++", "JavaScript", "SQL"],
-            "Libraries": ["TensorFlow", "PyTorch", "Scikit-learn", "Pandas", "NumPy"],
-            "Soft Skills": ["communication", "teamwork", "adaptability", "problem-solving"],
-            "Technical Skills": ["programming", "coding", "cloud", "networking", "engineering"],
-            "Management Skills": ["leadership", "planning", "strategy", "risk management"],
-            "Analytical Skills": ["data", "analysis", "decision-making", "quantitative"],
-            "Tools/Technologies": ["Excel", "Tableau", "Power BI", "SQL", "Python"]
-        }
-
-        # Categorize skills into predefined sections
-        for skill in skills:
-            added = False
-            for category, keywords in predefined_keywords.items():
-                if any(keyword.lower() in skill.lower() for keyword in keywords):
-                    if len(categories[category]) < 15:  # Allow up to 15 for Libraries and others
-                        categories[category].append(skill)
-                        added = True
-                        break
-
-            if not added and len(categories["Tools/Technologies"]) < 15:
-                categories["Tools/Technologies"].append(skill)
+        # Categorize skills with the shared taxonomy; unmatched skills go to Tools/Technologies
+        categories = get_classifier().group(skills, DEFAULT_SKILL_CATEGORY, limit=15)
 
         # UI to prioritize and adjust skill levels
         st.subheader(f"Skills for {role}")
@@ -289,26 +314,8 @@ def cached_generate_role_skills(role: str) -> Dict[str, List[str]]:
         return {"Error": ["No skills could be generated due to a processing error."]}
 
 def categorize_skills(skills: List[str]) -> Dict[str, List[str]]:
-    """Categorize skills into predefined categories."""
-    categories = {
-        "Technical Skills": [],
-        "Soft Skills": [],
-        "Management Skills": [],
-        "Industry Knowledge": [],
-        "Miscellaneous": [],
-    }
-    for skill in skills:
-        if "tech" in skill.lower():
-            categories["Technical Skills"].append(skill)
-        elif "soft" in skill.lower():
-            categories["Soft Skills"].append(skill)
-        elif "manager" in skill.lower():
-            categories["Management Skills"].append(skill)
-        elif "industry" in skill.lower():
-            categories["Industry Knowledge"].append(skill)
-        else:
-            categories["Miscellaneous"].append(skill)
-    return categories
+    """Categorize skills with the shared skill taxonomy (best-scoring category wins)."""
+    return get_classifier().group(skills, "Miscellaneous")
 
 # Utility Functions
 def validate_job_title(job_title: str) -> bool:
@@ -386,17 +393,14 @@ def cached_generate_role_benefits(role: str):
     # Construct the prompt
     prompt = (
         f"You are an expert HR consultant. List up to 10 benefits as keywords with no further explanation that would attract candidates "
-        f"to the role '{role}'. Provide them as bullet points."
+        f"to the role '{role}'."
     )
 
-    # Query the LLM
+    # Served from the combined role profile; only query the LLM separately if that section is empty
     try:
-        benefits_response = query_local_llm(prompt)
-        if not isinstance(benefits_response, str) or len(benefits_response.strip()) == 0:
-            raise ValueError("Invalid or empty LLM response.")
-
-        # Split response into lines and clean them
-        benefits = [benefit.strip() for benefit in benefits_response.split("\n") if benefit.strip()]
+        benefits = cached_generate_role_profile(role)["benefits"]
+        if not benefits:
+            benefits = query_local_list(prompt)
         if not benefits:
             raise ValueError("Empty benefit list generated.")
 
@@ -420,17 +424,14 @@ def cached_generate_role_recruitment_steps(role: str):
     # Construct the prompt
     prompt = (
         f"You are an expert HR consultant. List up to 10 ideal steps for the recruitment process as keywords with no further explanation for "
-        f"the role '{role}'. Provide them as bullet points."
+        f"the role '{role}'."
     )
 
-    # Query the LLM
+    # Served from the combined role profile; only query the LLM separately if that section is empty
     try:
-        recruitment_steps_response = query_local_llm(prompt)
-        if not isinstance(recruitment_steps_response, str) or len(recruitment_steps_response.strip()) == 0:
-            raise ValueError("Invalid or empty LLM response.")
-
-        # Split response into lines and clean them
-        recruitment_steps = [step.strip() for step in recruitment_steps_response.split("\n") if step.strip()]
+        recruitment_steps = cached_generate_role_profile(role)["recruitment_steps"]
+        if not recruitment_steps:
+            recruitment_steps = query_local_list(prompt)
         if not recruitment_steps:
             raise ValueError("Empty recruitment step list generated.")
 
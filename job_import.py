@@ -1 +1,363 @@
-#job_import.py
+# job_import.py
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+
+MANIFEST_FILE = "manifest.sqlite"
+
+# -------------------------
+# Records & Fingerprints
+# -------------------------
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only edits do not count as changes."""
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+def fingerprint(text: str) -> str:
+    """SHA-256 of the normalised record text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def iter_records(path: str, text_column: str, id_column: Optional[str] = None,
+                 chunksize: int = 10000) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Stream (key, text, metadata) from a CSV or JSON-lines file in
+    chunks. The key is "<file name>:<record id>"; without an id column the
+    record id is the text fingerprint.
+    """
+    if path.endswith((".json", ".jsonl")):
+        chunks = pd.read_json(path, lines=True, chunksize=chunksize)
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize)
+
+    source = os.path.basename(path)
+    for chunk in chunks:
+        for row in chunk.itertuples(index=False):
+            row = row._asdict()
+            text = row.get(text_column)
+            if not isinstance(text, str) or not text.strip():
+                continue
+            record_id = str(row[id_column]) if id_column else fingerprint(text)
+            metadata = {"source": source, "record_id": record_id}
+            yield f"{source}:{record_id}", text, metadata
+
+# -------------------------
+# Manifest
+# -------------------------
+class Manifest:
+    """
+    SQLite record of what has been embedded: record key -> fingerprint and
+    index row, plus one line per ingestion run.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, row INTEGER NOT NULL)"
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                started_at REAL, finished_at REAL, source TEXT,
+                seen INTEGER, added INTEGER, changed INTEGER, unchanged INTEGER
+            )
+            """
+        )
+        self.conn.commit()
+
+    def lookup(self, keys: List[str]) -> Dict[str, Tuple[str, int]]:
+        """Return {key: (fingerprint, row)} for the keys already embedded."""
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for key, fp, row in self.conn.execute(
+                f"SELECT key, fingerprint, row FROM records WHERE key IN ({placeholders})", batch
+            ):
+                found[key] = (fp, row)
+        return found
+
+    def upsert(self, entries: List[Tuple[str, str, int]]) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO records (key, fingerprint, row) VALUES (?, ?, ?)", entries)
+
+    def log_run(self, started_at: float, source: str, stats: Dict[str, int]) -> None:
+        self.conn.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (started_at, time.time(), source, stats["seen"], stats["added"], stats["changed"], stats["unchanged"]),
+        )
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+# -------------------------
+# Incremental Embedding
+# -------------------------
+def ingest(path: str, text_column: str, id_column: Optional[str] = None,
+           index_dir: str = config.FAISS_INDEX_DIR, batch_size: int = 256,
+           kind: str = "auto", expected_rows: int = 0, checkpoint_every: int = 100) -> Dict[str, int]:
+    """
+    Embed new and changed records from `path` into the on-disk index.
+
+    Each record is fingerprinted and compared with the manifest; only new
+    or changed rows are embedded (in batches) and appended. Superseded rows
+    are marked stale. The index is saved and the manifest committed every
+    `checkpoint_every` batches, so an interrupted run resumes where the
+    last checkpoint left off.
+
+    A new index is sized for `expected_rows`, or for the record count of
+    the file when that is 0. Index kinds that need training (IVF) are
+    trained once 39 vectors per list have been embedded. With kind "auto",
+    a flat index that has grown past config.FAISS_FLAT_MAX is rebuilt at
+    the end of the run.
+    """
+    import faiss
+    import numpy as np
+    from embeddings import embed_texts
+    from faiss_integration import INDEX_FILE, VectorIndex, create_index
+
+    os.makedirs(index_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(index_dir, MANIFEST_FILE))
+    vector_index = None
+    if os.path.exists(os.path.join(index_dir, INDEX_FILE)):
+        # Appending needs a writable index, so no mmap here
+        vector_index = VectorIndex.load(index_dir, mmap=False)
+    elif not expected_rows:
+        expected_rows = sum(1 for _ in iter_records(path, text_column, id_column))
+
+    stats = {"seen": 0, "added": 0, "changed": 0, "unchanged": 0}
+    started_at = time.time()
+    batches_since_checkpoint = 0
+    # Embedded batches held back until there are enough vectors to train the
+    # index. They are entered in the manifest right away, at the rows they
+    # will get, so later batches see them as known; their stale rows wait too.
+    untrained_index = None
+    held: List[Tuple[List[Tuple[str, str, Dict, str]], np.ndarray]] = []
+    held_rows = 0
+    held_stale: List[int] = []
+
+    def documents(pending: List[Tuple[str, str, Dict, str]]) -> List[Dict]:
+        return [{**metadata, "text": text[:config.FAISS_PASSAGE_CHARS]} for _, text, metadata, _ in pending]
+
+    def record(pending: List[Tuple[str, str, Dict, str]], known: Dict, first_row: int) -> List[int]:
+        """Enter the pending records in the manifest; returns the rows they supersede."""
+        manifest.upsert([(key, fp, first_row + i) for i, (key, _, _, fp) in enumerate(pending)])
+        changed = sum(1 for key, _, _, _ in pending if key in known)
+        stats["changed"] += changed
+        stats["added"] += len(pending) - changed
+        return [known[key][1] for key, _, _, _ in pending if key in known]
+
+    def create(final: bool) -> None:
+        nonlocal vector_index, untrained_index, held_rows
+        dimension = held[0][1].shape[1]
+        if untrained_index is None:
+            untrained_index = create_index(dimension, max(expected_rows, held_rows), kind)
+        index = untrained_index
+        if not index.is_trained:
+            if held_rows < index.nlist * 39 and not final:
+                return
+            if held_rows < index.nlist * 39:
+                # Fewer records than expected; size the lists for what there is
+                index = create_index(dimension, held_rows, kind)
+            index.train(np.vstack([vectors for _, vectors in held]))
+        vector_index = VectorIndex(index, [])
+        for pending, vectors in held:
+            vector_index.add(vectors, documents(pending))
+        vector_index.mark_stale(held_stale)
+        held.clear()
+        held_stale.clear()
+        held_rows = 0
+
+    def flush(batch: List[Tuple[str, str, Dict, str]], final: bool = False) -> None:
+        nonlocal batches_since_checkpoint, held_rows
+        # A record repeated within the batch only counts with its last version
+        batch = list({item[0]: item for item in batch}.values())
+        known = manifest.lookup([key for key, _, _, _ in batch])
+        pending = []
+        for key, text, metadata, fp in batch:
+            if key in known and known[key][0] == fp:
+                stats["unchanged"] += 1
+                continue
+            pending.append((key, text, metadata, fp))
+
+        if pending:
+            vectors = embed_texts([text for _, text, _, _ in pending])
+            if vector_index is None:
+                held.append((pending, vectors))
+                held_stale.extend(record(pending, known, held_rows))
+                held_rows += len(pending)
+            else:
+                first_row = len(vector_index)
+                vector_index.add(vectors, documents(pending))
+                vector_index.mark_stale(record(pending, known, first_row))
+        if vector_index is None and held:
+            create(final)
+        if vector_index is None or not pending:
+            return
+
+        batches_since_checkpoint += 1
+        if batches_since_checkpoint >= checkpoint_every:
+            vector_index.save(index_dir)
+            manifest.commit()
+            batches_since_checkpoint = 0
+
+    batch = []
+    for key, text, metadata in iter_records(path, text_column, id_column):
+        stats["seen"] += 1
+        batch.append((key, text, metadata, fingerprint(text)))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+            elapsed = time.time() - started_at
+            print(f"\r{stats['seen']} records seen, {stats['added'] + stats['changed']} embedded "
+                  f"({stats['seen'] / elapsed:.0f} rec/s)", end="", file=sys.stderr)
+    flush(batch, final=True)
+
+    if vector_index is not None:
+        if (kind == "auto" and isinstance(vector_index.index, faiss.IndexFlat)
+                and len(vector_index) > config.FAISS_FLAT_MAX):
+            vector_index = vector_index.rebuild(kind)
+        vector_index.save(index_dir)
+    manifest.log_run(started_at, path, stats)
+    manifest.commit()
+    manifest.close()
+    print(file=sys.stderr)
+    return stats
+
+# -------------------------
+# Bulk Encoding
+# -------------------------
+def encode(path: str, text_column: str, out_path: str, batch_size: int = config.EMBEDDING_BATCH_SIZE,
+           workers: int = config.EMBEDDING_WORKERS, dtype: str = "float32") -> Dict[str, float]:
+    """
+    Embed every record of a CSV/JSON-lines corpus into an np.memmap file,
+    for corpora too large to embed in memory. A cheap first pass counts the
+    records so the output can be preallocated.
+    """
+    from embeddings import embed_to_memmap
+
+    count = sum(1 for _ in iter_records(path, text_column))
+    texts = (text for _, text, _ in iter_records(path, text_column))
+    return embed_to_memmap(texts, count, out_path, batch_size=batch_size, workers=workers, dtype=dtype)
+
+# -------------------------
+# Bulk Job Ad Import
+# -------------------------
+JOB_AD_SCHEMA_FIELDS = [
+    ("source_path", "string"), ("file_name", "string"), ("extension", "string"), ("sha256", "string"),
+    ("size_bytes", "int64"), ("job_description", "string"), ("num_chars", "int64"), ("error", "string"),
+]
+
+
+def import_job_ads(source: str, out_path: str, workers: int = 4, row_group_size: int = 1000) -> Dict[str, int]:
+    """
+    Parse a directory or archive of PDF/DOCX/TXT job ads in parallel and
+    write one normalised record per unique document (by SHA-256) to a
+    Parquet file, flushing a row group every `row_group_size` records.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from data_extraction import parse_documents
+
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in JOB_AD_SCHEMA_FIELDS])
+    stats = {"parsed": 0, "duplicates": 0, "errors": 0}
+    seen = set()
+    rows = []
+    started_at = time.time()
+
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with pq.ParquetWriter(out_path, schema) as writer:
+        for record in parse_documents(source, workers=workers):
+            if record["sha256"] in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(record["sha256"])
+            stats["parsed"] += 1
+            stats["errors"] += bool(record["error"])
+            rows.append(record)
+            if len(rows) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+                print(f"\r{stats['parsed']} documents ({stats['parsed'] / (time.time() - started_at):.1f} docs/s)",
+                      end="", file=sys.stderr)
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    print(file=sys.stderr)
+    return stats
+
+# -------------------------
+# Command Line
+# -------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import job/skills data into the Vacalyser vector index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    embed = commands.add_parser("embed", help="Incrementally embed a CSV/JSON-lines corpus into the FAISS index.")
+    embed.add_argument("source", help="CSV or JSON-lines file, e.g. data/job_summary_preprocessed.csv")
+    embed.add_argument("--text-column", required=True, help="Column holding the text to embed.")
+    embed.add_argument("--id-column", help="Stable record id column (default: content fingerprint).")
+    embed.add_argument("--index-dir", default=config.FAISS_INDEX_DIR)
+    embed.add_argument("--batch-size", type=int, default=256)
+    embed.add_argument("--kind", choices=["auto", "flat", "hnsw", "ivf"], default="auto",
+                       help="Index type when creating a new index.")
+    embed.add_argument("--expected-rows", type=int, default=0,
+                       help="Corpus size hint for a new index (default: count the records in the file).")
+    embed.add_argument("--checkpoint-every", type=int, default=100, help="Save every N batches.")
+
+    bulk = commands.add_parser("encode", help="Embed a whole corpus into a memory-mapped vector file.")
+    bulk.add_argument("source", help="CSV or JSON-lines file")
+    bulk.add_argument("--text-column", required=True)
+    bulk.add_argument("--out", required=True, help="Output path of the memmap (shape/dtype go to <out>.json).")
+    bulk.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE)
+    bulk.add_argument("--workers", type=int, default=config.EMBEDDING_WORKERS, help="Encoding processes (0 = in-process).")
+    bulk.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+
+    ads = commands.add_parser("import", help="Bulk-parse a directory or archive of job ads into Parquet.")
+    ads.add_argument("source", help="Directory or .zip/.tar(.gz) archive with PDF/DOCX/TXT files")
+    ads.add_argument("--out", default=os.path.join("data", "job_ads.parquet"))
+    ads.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes (0 = in-process).")
+    ads.add_argument("--row-group-size", type=int, default=1000)
+
+    taxonomy = commands.add_parser("taxonomy", help="Build the compiled skill taxonomy from a skills corpus.")
+    taxonomy.add_argument("source", help="CSV with one comma-separated skill list per job, e.g. data/skills_preprocessed.csv")
+    taxonomy.add_argument("--column", default="job_skills", help="Column holding the skill lists.")
+    taxonomy.add_argument("--out", default=config.SKILL_TAXONOMY_INDEX)
+    taxonomy.add_argument("--min-count", type=int, default=20, help="Minimum number of jobs mentioning a skill.")
+    taxonomy.add_argument("--min-weight", type=float, default=0.4, help="Minimum category weight for derived skills.")
+
+    args = parser.parse_args(argv)
+    if args.command == "embed":
+        stats = ingest(
+            args.source, args.text_column, args.id_column, index_dir=args.index_dir,
+            batch_size=args.batch_size, kind=args.kind, expected_rows=args.expected_rows,
+            checkpoint_every=args.checkpoint_every,
+        )
+        print(f"seen={stats['seen']} added={stats['added']} changed={stats['changed']} unchanged={stats['unchanged']}")
+    elif args.command == "import":
+        stats = import_job_ads(args.source, args.out, workers=args.workers, row_group_size=args.row_group_size)
+        print(f"parsed={stats['parsed']} duplicates={stats['duplicates']} errors={stats['errors']}")
+    elif args.command == "taxonomy":
+        from skill_taxonomy import build_taxonomy
+        stats = build_taxonomy(args.source, args.out, column=args.column, min_count=args.min_count, min_weight=args.min_weight)
+        print(f"jobs={stats['jobs']} phrases={stats['phrases']} keywords={stats['keywords']} derived={stats['derived']}")
+    elif args.command == "encode":
+        encode(args.source, args.text_column, args.out, batch_size=args.batch_size, workers=args.workers, dtype=args.dtype)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
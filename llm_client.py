@@ -0,0 +1,515 @@
+# llm_client.py
+
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+from cache_store import make_key, open_cache, single_flight
+
+# -------------------------
+# Pooled HTTP Session
+# -------------------------
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    """
+    Create a requests.Session with a keep-alive connection pool and
+    retries with exponential backoff for transient failures.
+    """
+    retry = Retry(
+        total=config.HTTP_MAX_RETRIES,
+        connect=config.HTTP_MAX_RETRIES,
+        read=0,  # never replay a generation that already reached the model
+        backoff_factor=config.HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=config.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _timeout(read_timeout: Optional[float]):
+    return (config.HTTP_CONNECT_TIMEOUT, read_timeout or config.LLM_READ_TIMEOUT)
+
+# -------------------------
+# Token Budgeting
+# -------------------------
+# Ollama does not expose its tokenizer, so budgets use a conservative
+# characters-per-token estimate for English/German LLaMA vocabularies.
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough upper-bound token count for a piece of text."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text so that estimate_tokens(result) <= max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:int((max_tokens - 1) * CHARS_PER_TOKEN)]
+
+# -------------------------
+# Response Cache
+# -------------------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the persistent prompt/response cache (SQLiteCache, or RedisCache
+    when CACHE_BACKEND_URL points at Redis), or None if disabled.
+    """
+    global _cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = open_cache(config.CACHE_BACKEND_URL, config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_BYTES,
+                                    ttl=config.LLM_CACHE_TTL, prefix=config.CACHE_KEY_PREFIX)
+    return _cache
+
+
+def _cache_key(backend: str, model: str, prompt: str, options: Optional[Dict], format=None) -> str:
+    if format is None:
+        return make_key(backend, model, prompt, options or {})
+    return make_key(backend, model, prompt, options or {}, format)
+
+
+def _cache_get(key: str, use_cache: bool) -> Optional[str]:
+    cache = get_cache() if use_cache else None
+    return cache.get_text(key) if cache else None
+
+
+def _cache_set(key: str, text: str, use_cache: bool) -> None:
+    cache = get_cache() if use_cache else None
+    if cache and text:
+        cache.set_text(key, text)
+
+
+def _cached_call(key: str, use_cache: bool, compute: Callable[[], str]) -> str:
+    """Serve `key` from the cache, or run `compute` once across every process sharing the cache."""
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        return compute()
+
+    def run() -> Optional[bytes]:
+        text = compute()
+        return text.encode("utf-8") if text else None
+
+    value = single_flight(cache, key, run, lease=config.SINGLE_FLIGHT_LEASE, poll=config.SINGLE_FLIGHT_POLL)
+    return value.decode("utf-8") if value is not None else ""
+
+
+def shared_json(name: str, parts: Sequence[Any], compute: Callable[[], Any], use_cache: bool = True) -> Any:
+    """
+    Memoise a JSON-serialisable result under (name, *parts) in the shared
+    cache, computed once across replicas. Falsy results are returned but
+    not stored, so a failed generation is retried by the next caller.
+    """
+    result = {}
+
+    def run() -> str:
+        result["value"] = compute()
+        return json.dumps(result["value"]) if result["value"] else ""
+
+    text = _cached_call(make_key(name, *parts), use_cache, run)
+    return json.loads(text) if text else result.get("value")
+
+# -------------------------
+# Scheduling
+# -------------------------
+# Lower runs first: interactive calls (auto-fill, job ad) overtake background prefetch
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = threading.local()
+
+
+@contextmanager
+def priority(level: int):
+    """Run the LLM calls made by this thread inside the block at `level`."""
+    previous = getattr(_priority, "level", INTERACTIVE)
+    _priority.level = level
+    try:
+        yield
+    finally:
+        _priority.level = previous
+
+
+def current_priority() -> int:
+    return getattr(_priority, "level", INTERACTIVE)
+
+
+class _Timings:
+    """Count, total, max and recent samples (for percentiles) of a duration."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {"avg": self.total / self.count if self.count else 0.0, "p95": p95, "max": self.max}
+
+
+class _Ticket:
+    """A request waiting for a slot; its level can be raised while it waits."""
+
+    __slots__ = ("level", "sequence", "backend", "queued")
+
+    def __init__(self, level: int, sequence: int, backend: str):
+        self.level = level
+        self.sequence = sequence
+        self.backend = backend
+        self.queued = True
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.level, self.sequence) < (other.level, other.sequence)
+
+
+class _SharedCall:
+    """The priority of a coalesced call: the most urgent of everyone waiting on it."""
+
+    def __init__(self, level: int):
+        self.level = level
+        self.ticket: Optional[_Ticket] = None
+
+
+class LLMScheduler:
+    """
+    Caps the requests in flight per backend and queues the rest by
+    priority (FIFO within a priority). A queued request that others have
+    joined through the coalescer runs at the most urgent of their
+    priorities (see promote). Records per backend the queue depth,
+    the time spent waiting for a slot and the time spent in the request,
+    so queueing and generation latency can be told apart.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._queues: Dict[str, list] = {}
+        self._running: Dict[str, int] = {}
+        self._stats: Dict[str, Dict] = {}
+
+    def _backend_stats(self, backend: str) -> Dict:
+        if backend not in self._stats:
+            self._stats[backend] = {"completed": 0, "failed": 0, "max_queue_depth": 0,
+                                    "wait": _Timings(), "service": _Timings()}
+        return self._stats[backend]
+
+    @contextmanager
+    def slot(self, backend: str, level: Optional[int] = None):
+        """Block until a request to `backend` may run, then hold the slot for the block."""
+        level = current_priority() if level is None else level
+        call = getattr(_priority, "call", None)
+        limit = max(1, self.limits.get(backend, 1))
+        enqueued = time.perf_counter()
+        with self._cond:
+            ticket = _Ticket(level if call is None else min(level, call.level), next(self._sequence), backend)
+            if call is not None:
+                call.ticket = ticket
+            queue = self._queues.setdefault(backend, [])
+            stats = self._backend_stats(backend)
+            heapq.heappush(queue, ticket)
+            stats["max_queue_depth"] = max(stats["max_queue_depth"], len(queue))
+            while self._running.get(backend, 0) >= limit or queue[0] is not ticket:
+                self._cond.wait()
+            heapq.heappop(queue)
+            ticket.queued = False
+            self._running[backend] = self._running.get(backend, 0) + 1
+            stats["wait"].add(time.perf_counter() - enqueued)
+            # The next ticket may fit into another free slot
+            self._cond.notify_all()
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        except GeneratorExit:
+            # A streaming caller stopped reading; that is not a failed request
+            failed = False
+            raise
+        finally:
+            with self._cond:
+                self._running[backend] -= 1
+                stats["service"].add(time.perf_counter() - started)
+                stats["failed" if failed else "completed"] += 1
+                self._cond.notify_all()
+
+    def promote(self, call: _SharedCall, level: int) -> None:
+        """Raise a coalesced call, and its ticket if still queued, to `level` if that is more urgent."""
+        with self._cond:
+            if level >= call.level:
+                return
+            call.level = level
+            ticket = call.ticket
+            if ticket is not None and ticket.queued and level < ticket.level:
+                ticket.level = level
+                heapq.heapify(self._queues[ticket.backend])
+                self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Per backend: limit, in_flight, queue_depth, max_queue_depth, completed, failed, wait and service seconds (avg/p95/max)."""
+        with self._cond:
+            return {
+                backend: {
+                    "limit": self.limits.get(backend, 1),
+                    "in_flight": self._running.get(backend, 0),
+                    "queue_depth": len(self._queues.get(backend, [])),
+                    "max_queue_depth": stats["max_queue_depth"],
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "wait_seconds": stats["wait"].summary(),
+                    "service_seconds": stats["service"].summary(),
+                }
+                for backend, stats in self._stats.items()
+            }
+
+
+_scheduler = LLMScheduler({"ollama": config.LLM_MAX_IN_FLIGHT_OLLAMA, "groq": config.LLM_MAX_IN_FLIGHT_GROQ})
+
+
+def get_metrics() -> Dict[str, Dict]:
+    """Scheduler metrics per backend, plus the number of coalesced duplicate requests."""
+    metrics = _scheduler.metrics()
+    metrics["coalesced_requests"] = _coalescer.coalesced
+    return metrics
+
+# -------------------------
+# Request Coalescing
+# -------------------------
+class RequestCoalescer:
+    """
+    In-process single-flight: while a call for a key is running, identical
+    calls from other threads (Streamlit sessions) wait on the same future
+    instead of sending the request again, and all get its result or error.
+    A caller joining with a more urgent priority than the leader's raises
+    the leader's queued request in `scheduler`, so an interactive call never
+    waits behind background work it merely shares.
+    """
+
+    def __init__(self, scheduler: Optional[LLMScheduler] = None):
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Tuple[Future, _SharedCall]] = {}
+        self.coalesced = 0
+
+    def run(self, key: str, fn: Callable[[], str]) -> str:
+        with self._lock:
+            leader = key not in self._calls
+            if leader:
+                self._calls[key] = (Future(), _SharedCall(current_priority()))
+            else:
+                self.coalesced += 1
+            future, call = self._calls[key]
+        if not leader:
+            if self.scheduler is not None:
+                self.scheduler.promote(call, current_priority())
+            return future.result()
+        previous = getattr(_priority, "call", None)
+        _priority.call = call
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            _priority.call = previous
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_coalescer = RequestCoalescer(_scheduler)
+
+# -------------------------
+# Structured Output
+# -------------------------
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def json_schema_from_defaults(defaults: Dict) -> Dict:
+    """
+    JSON schema for an object with one required property per key, typed
+    after its default value (lists become arrays of strings).
+    """
+    properties = {}
+    for key, default in defaults.items():
+        if isinstance(default, list):
+            properties[key] = {"type": "array", "items": {"type": "string"}}
+        else:
+            properties[key] = {"type": _JSON_TYPES.get(type(default), "string")}
+    return {"type": "object", "properties": properties, "required": list(defaults)}
+
+
+def string_list_schema(keys: List[str]) -> Dict:
+    """Schema for an object whose keys each hold an array of strings."""
+    return json_schema_from_defaults({key: [] for key in keys})
+
+
+def _ollama_format(format: Union[str, Dict, None]):
+    if isinstance(format, dict) and not config.OLLAMA_JSON_SCHEMA:
+        return "json"
+    return format
+
+
+def _ollama_payload(prompt: str, model: str, stream: bool, options: Optional[Dict], format) -> Dict:
+    payload = {"model": model, "prompt": prompt, "stream": stream}
+    if options:
+        payload["options"] = options
+    if format is not None:
+        payload["format"] = format
+    return payload
+
+# -------------------------
+# Ollama
+# -------------------------
+def generate(prompt: str, model: str, options: Optional[Dict] = None, timeout: Optional[float] = None,
+             use_cache: bool = True, format: Union[str, Dict, None] = None) -> str:
+    """
+    Run a non-streaming generation against the local Ollama server.
+    Responses are served from / stored in the persistent cache; concurrent
+    identical requests in this process share one call, those on other
+    replicas wait for it through the cache (single-flight).
+
+    `format` is "json" or a JSON schema dict; Ollama then constrains the
+    output so it parses on the first try.
+
+    Raises requests.RequestException on connection/HTTP errors and
+    ValueError if the server does not return valid JSON.
+    """
+    format = _ollama_format(format)
+    payload = _ollama_payload(prompt, model, False, options, format)
+
+    def request() -> str:
+        with _scheduler.slot("ollama"):
+            response = get_session().post(config.OLLAMA_GENERATE_URL, json=payload, timeout=_timeout(timeout))
+            response.raise_for_status()
+            return response.json().get("response", "")
+
+    key = _cache_key("ollama", model, prompt, options, format)
+    return _coalescer.run(key, lambda: _cached_call(key, use_cache, request))
+
+def stream_generate(prompt: str, model: str, options: Optional[Dict] = None, timeout: Optional[float] = None,
+                    use_cache: bool = True, format: Union[str, Dict, None] = None) -> Iterator[str]:
+    """
+    Stream a generation from the local Ollama server, yielding tokens as
+    they arrive on the NDJSON response. A cached response is yielded as a
+    single chunk; a completed stream is written to the cache.
+
+    The scheduler slot and the connection are held until the stream
+    finishes or the caller stops iterating. Raises requests.RequestException on
+    connection/HTTP errors and ValueError on malformed or error chunks.
+    `format` works as in generate.
+    """
+    format = _ollama_format(format)
+    key = _cache_key("ollama", model, prompt, options, format)
+    cached = _cache_get(key, use_cache)
+    if cached is not None:
+        yield cached
+        return
+
+    payload = _ollama_payload(prompt, model, True, options, format)
+
+    with _scheduler.slot("ollama"), \
+            get_session().post(config.OLLAMA_GENERATE_URL, json=payload, stream=True, timeout=_timeout(timeout)) as response:
+        response.raise_for_status()
+        tokens = []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if "error" in data:
+                raise ValueError(data["error"])
+            token = data.get("response", "")
+            if token:
+                tokens.append(token)
+                yield token
+            if data.get("done", False):
+                _cache_set(key, "".join(tokens), use_cache)
+                break
+
+# -------------------------
+# Groq (OpenAI-compatible)
+# -------------------------
+def chat_completion(prompt: str, model: str, api_key: Optional[str] = None, timeout: Optional[float] = None,
+                    use_cache: bool = True) -> str:
+    """
+    Send a single-turn chat completion to the Groq API.
+    Responses are served from / stored in the persistent cache.
+
+    Raises requests.RequestException on connection/HTTP errors and
+    ValueError/KeyError on malformed responses.
+    """
+    headers = {"Authorization": f"Bearer {api_key or config.GROQ_API_KEY}"}
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+
+    def request() -> str:
+        with _scheduler.slot("groq"):
+            response = get_session().post(config.GROQ_API_URL, json=payload, headers=headers, timeout=_timeout(timeout))
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+
+    key = _cache_key("groq", model, prompt, None)
+    return _coalescer.run(key, lambda: _cached_call(key, use_cache, request))
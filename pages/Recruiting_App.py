@@ -11,6 +11,7 @@ from helpers.utils import (
     cached_generate_role_recruitment_steps,
     query_local_llm
 )
+from skill_normalizer import get_normalizer
 
 # Dynamically add the project root to the Python path to fix import issues
 sys.path.append(str(Path(__file__).resolve().parent.parent))
@@ -115,7 +116,12 @@ def role_skills_page():
     nice_to_have_skills = st.session_state.get("nice_to_have_skills", [])
 
     st.markdown("### Categorize the Skills")
+    # Checkbox keys are derived from the skill name, so each skill may only be rendered once
+    normalizer = get_normalizer()
+    rendered = set()
     for category, skills in skills_categories.items():
+        skills = [skill for skill in normalizer.dedupe(skills) if normalizer.canonical(skill)[0] not in rendered]
+        rendered.update(normalizer.canonical(skill)[0] for skill in skills)
         st.subheader(f"{category}")
         for skill in skills:
             col1, col2 = st.columns(2)
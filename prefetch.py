@@ -0,0 +1,61 @@
+# prefetch.py
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+import streamlit as st
+
+import config
+import llm_client
+from helpers.utils import generate_role_profile, query_local_llm_raw
+
+# Shared by all sessions of this process so concurrent users cannot
+# oversubscribe the LLM server with prefetch work.
+_executor = ThreadPoolExecutor(max_workers=config.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+def _generate_in_background(job_title: str):
+    # Queued behind interactive LLM calls by the llm_client scheduler
+    with llm_client.priority(llm_client.BACKGROUND):
+        return generate_role_profile(job_title, query_local_llm_raw)
+
+
+def prefetch_role_suggestions(job_title: str) -> Optional[Future]:
+    """
+    Start generating skills, benefits and recruitment steps for the job title
+    in the background. The future is kept in st.session_state["role_prefetch"]
+    and only replaced when the job title changes; the previous one is then
+    cancelled unless it has already started.
+    """
+    job_title = (job_title or "").strip()
+    if not job_title:
+        return None
+
+    state = st.session_state.get("role_prefetch")
+    if state and state["job_title"] == job_title:
+        return state["future"]
+    if state:
+        state["future"].cancel()
+
+    # The worker must not touch st.*; the raw query raises instead and the
+    # response lands in the persistent LLM cache for the foreground path.
+    future = _executor.submit(_generate_in_background, job_title)
+    st.session_state["role_prefetch"] = {"job_title": job_title, "future": future}
+    return future
+
+
+def get_prefetched_suggestions(job_title: str, section: str) -> Optional[List[str]]:
+    """
+    Return one section ("skills", "benefits", "recruitment_steps") of the
+    prefetched role profile without waiting for it: None while it is still
+    running, an empty list if nothing could be generated.
+    """
+    future = prefetch_role_suggestions(job_title)
+    if future is None:
+        return []
+    if not future.done():
+        return None
+    try:
+        return future.result().get(section, [])
+    except Exception:
+        return []
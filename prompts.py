@@ -1,10 +1,10 @@
 # prompts.py
 
-from functions import fetch_from_llama
+from functions import fetch_from_llama, stream_from_llama
 
-def generate_job_ad(session_data):
+def build_job_ad_prompt(session_data):
     """
-    Generate a job ad from the session data.
+    Build the job ad prompt from the session data.
     This is a simple version. Extend or refine as needed.
     """
     job_title = session_data.get("job_title", "No Title")
@@ -13,8 +13,8 @@ def generate_job_ad(session_data):
     benefits = session_data.get("benefits", "")
     tasks = session_data.get("tasks", "")
     responsibilities = session_data.get("responsibility_distribution", "")
-    
-    prompt = f"""
+
+    return f"""
     You are an AI specialized in HR. Create a compelling job ad for the following role:
     Job Title: {job_title}
     Company: {company_name}
@@ -24,18 +24,17 @@ def generate_job_ad(session_data):
     Benefits: {benefits}
     Make it engaging and concise. Return a plain text version.
     """
-    return fetch_from_llama(prompt)
 
-def generate_interview_prep(session_data, audience="HR"):
+def build_interview_prep_prompt(session_data, audience="HR"):
     """
-    Generate an interview preparation guide from session data.
+    Build the interview preparation prompt from session data.
     Audience might be 'HR', 'Technical', etc.
     """
     job_title = session_data.get("job_title", "No Title")
     tasks = session_data.get("tasks", "")
     responsibilities = session_data.get("responsibility_distribution", "")
-    
-    prompt = f"""
+
+    return f"""
     You are an AI specialized in recruitment. Generate an interview preparation guide
     for a {job_title} role aimed at {audience} interviewers. The role has these key tasks:
     {tasks}
@@ -43,4 +42,27 @@ def generate_interview_prep(session_data, audience="HR"):
     {responsibilities}
     Return a structured, step-by-step guide in plain text.
     """
-    return fetch_from_llama(prompt)
+
+def generate_job_ad(session_data):
+    """
+    Generate a job ad from the session data.
+    """
+    return fetch_from_llama(build_job_ad_prompt(session_data))
+
+def stream_job_ad(session_data):
+    """
+    Stream the job ad token by token (see generate_job_ad).
+    """
+    return stream_from_llama(build_job_ad_prompt(session_data))
+
+def generate_interview_prep(session_data, audience="HR"):
+    """
+    Generate an interview preparation guide from session data.
+    """
+    return fetch_from_llama(build_interview_prep_prompt(session_data, audience))
+
+def stream_interview_prep(session_data, audience="HR"):
+    """
+    Stream the interview preparation guide token by token (see generate_interview_prep).
+    """
+    return stream_from_llama(build_interview_prep_prompt(session_data, audience))
@@ -0,0 +1,185 @@
+# skill_normalizer.py
+
+import json
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+from skill_taxonomy import tokenize
+
+# -------------------------
+# Aliases
+# -------------------------
+# Alias -> canonical name. Keys are matched on their token form, so casing,
+# hyphens and plural "s" do not matter.
+DEFAULT_ALIASES = {
+    "sklearn": "Scikit-learn",
+    "scikit": "Scikit-learn",
+    "js": "JavaScript",
+    "ts": "TypeScript",
+    "node": "Node.js",
+    "nodejs": "Node.js",
+    "reactjs": "React",
+    "react.js": "React",
+    "k8s": "Kubernetes",
+    "tf": "TensorFlow",
+    "torch": "PyTorch",
+    "postgres": "PostgreSQL",
+    "psql": "PostgreSQL",
+    "ms excel": "Excel",
+    "microsoft excel": "Excel",
+    "powerbi": "Power BI",
+    "gcp": "Google Cloud",
+    "ml": "Machine Learning",
+    "ai": "Artificial Intelligence",
+    "nlp": "Natural Language Processing",
+    "ci cd": "CI/CD",
+    "golang": "Go",
+}
+
+# Filler words LLMs append to skill names ("Communication skills", "Python programming")
+GENERIC_TOKENS = {"skill", "experience", "knowledge", "proficiency", "expertise", "abilitie", "ability"}
+
+# -------------------------
+# Cleaning
+# -------------------------
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*•·–>]+|\(?\d{1,3}[.)]|[a-z][.)](?=\s))\s*", re.IGNORECASE)
+# "#" only as a markdown heading marker, so "C#" and "F#" survive
+HEADING_PATTERN = re.compile(r"^\s*#+\s+")
+MARKUP_PATTERN = re.compile(r"[*_`]+")
+
+
+def clean_skill(text: str) -> str:
+    """Strip list bullets, numbering, markdown emphasis, quotes and trailing punctuation."""
+    text = MARKUP_PATTERN.sub("", BULLET_PATTERN.sub("", HEADING_PATTERN.sub("", str(text))))
+    text = re.sub(r"\s+", " ", text).strip(" \t\"'.,;:")
+    return text
+
+
+def split_skill_lines(lines: Iterable[str]) -> List[str]:
+    """
+    Turn raw LLM lines into skill names: headers ("Soft Skills:") are
+    dropped and "Header: a, b, c" lines are expanded into their items.
+    """
+    skills = []
+    for line in lines:
+        line = MARKUP_PATTERN.sub("", HEADING_PATTERN.sub("", str(line))).strip()
+        if not line or line.endswith(":"):
+            continue
+        if ":" in line:
+            line = line.split(":", 1)[1]
+            skills.extend(clean_skill(item) for item in line.split(","))
+        else:
+            skills.append(clean_skill(line))
+    return [skill for skill in skills if skill]
+
+# -------------------------
+# Normalizer
+# -------------------------
+def _trigrams(key: str) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SkillNormalizer:
+    """
+    Canonicalises and de-duplicates skill names.
+
+    Each skill is cleaned, tokenized and stripped of filler words; the
+    tokens form its key, so "scikit learn", "Scikit-Learn" and "- scikit-learn"
+    collide exactly. Keys in the alias table map to a canonical name
+    ("sklearn" -> "Scikit-learn"). Remaining near-duplicates (typos,
+    spacing) are merged through a character-trigram inverted index when
+    their Jaccard similarity reaches `threshold`.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None, threshold: float = 0.7, min_fuzzy_length: int = 5):
+        self.threshold = threshold
+        self.min_fuzzy_length = min_fuzzy_length
+        self._aliases: Dict[str, str] = {}
+        for alias, canonical in (DEFAULT_ALIASES if aliases is None else aliases).items():
+            self._aliases[self._raw_key(alias)] = canonical
+            self._aliases[self._raw_key(canonical)] = canonical
+
+    @staticmethod
+    def _raw_key(skill: str) -> str:
+        tokens = tokenize(clean_skill(skill))
+        meaningful = [token for token in tokens if token not in GENERIC_TOKENS]
+        return " ".join(meaningful or tokens)
+
+    def canonical(self, skill: str) -> Tuple[str, str]:
+        """(key, display name) for a skill; both empty if nothing is left after cleaning."""
+        cleaned = clean_skill(skill)
+        key = self._raw_key(cleaned)
+        if key in self._aliases:
+            canonical = self._aliases[key]
+            return self._raw_key(canonical), canonical
+        return key, cleaned
+
+    def dedupe(self, skills: Iterable[str]) -> List[str]:
+        """
+        Canonical names of `skills` without duplicates, in order of first
+        appearance. For a merged group the alias target wins, otherwise the
+        first spelling that is not all lower-case.
+        """
+        names: List[str] = []
+        exact: Dict[str, int] = {}
+        gram_counts: List[int] = []
+        trigram_index: Dict[str, List[int]] = {}
+        for skill in skills:
+            key, name = self.canonical(skill)
+            if not key:
+                continue
+            group = exact.get(key)
+            compact = key.replace(" ", "")
+            if group is None and len(compact) >= self.min_fuzzy_length:
+                group = self._fuzzy_match(compact, gram_counts, trigram_index)
+            if group is None:
+                group = len(names)
+                names.append(name)
+                grams = _trigrams(compact)
+                gram_counts.append(len(grams))
+                if len(compact) >= self.min_fuzzy_length:
+                    for trigram in grams:
+                        trigram_index.setdefault(trigram, []).append(group)
+            elif names[group].islower() and not name.islower():
+                names[group] = name
+            exact[key] = group
+        return names
+
+    def _fuzzy_match(self, compact: str, gram_counts: List[int], trigram_index: Dict[str, List[int]]) -> Optional[int]:
+        grams = _trigrams(compact)
+        shared: Dict[int, int] = {}
+        for trigram in grams:
+            for group in trigram_index.get(trigram, ()):
+                shared[group] = shared.get(group, 0) + 1
+        best, best_score = None, self.threshold
+        for group, overlap in shared.items():
+            score = overlap / (len(grams) + gram_counts[group] - overlap)
+            if score >= best_score:
+                best, best_score = group, score
+        return best
+
+
+_normalizer: Optional[SkillNormalizer] = None
+_normalizer_lock = threading.Lock()
+
+
+def get_normalizer() -> SkillNormalizer:
+    """Process-wide normalizer with the default aliases plus SKILL_ALIASES_PATH, if set."""
+    global _normalizer
+    if _normalizer is None:
+        with _normalizer_lock:
+            if _normalizer is None:
+                aliases = dict(DEFAULT_ALIASES)
+                if config.SKILL_ALIASES_PATH:
+                    with open(config.SKILL_ALIASES_PATH, encoding="utf-8") as f:
+                        aliases.update(json.load(f))
+                _normalizer = SkillNormalizer(aliases, threshold=config.SKILL_FUZZY_THRESHOLD)
+    return _normalizer
+
+
+def normalize_skills(skills: Iterable[str]) -> List[str]:
+    """Clean, canonicalise and de-duplicate a list of skills with the shared normalizer."""
+    return get_normalizer().dedupe(skills)
@@ -0,0 +1,356 @@
+# skill_taxonomy.py
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+# -------------------------
+# Default Taxonomy
+# -------------------------
+# Category -> keywords. Order matters: on equal scores the earlier category wins.
+DEFAULT_TAXONOMY = {
+    "Programming Languages": ["Python", "Java", "C++", "JavaScript", "SQL"],
+    "Libraries": ["TensorFlow", "PyTorch", "Scikit-learn", "Pandas", "NumPy"],
+    "Soft Skills": ["communication", "teamwork", "adaptability", "problem-solving"],
+    "Technical Skills": ["programming", "coding", "cloud", "networking", "engineering"],
+    "Management Skills": ["leadership", "planning", "strategy", "risk management"],
+    "Analytical Skills": ["data", "analysis", "decision-making", "quantitative"],
+    "Tools/Technologies": ["Excel", "Tableau", "Power BI", "SQL", "Python"],
+}
+# Where cached_generate_role_skills puts skills no category matches
+DEFAULT_SKILL_CATEGORY = "Tools/Technologies"
+
+# -------------------------
+# Tokenization
+# -------------------------
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+(?:\.[a-z0-9]+)*")
+
+
+def _stem(token: str) -> str:
+    # Plural "s" only: enough to match "Databases" with "database" without a stemmer
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Lower-case word tokens; "-", "_" and "/" separate words, "C++", "C#" and "node.js" stay whole."""
+    return tuple(_stem(token) for token in TOKEN_PATTERN.findall(text.lower().replace("_", " ")))
+
+# -------------------------
+# Classifier
+# -------------------------
+class SkillClassifier:
+    """
+    Token-set index over a {category: [keywords]} taxonomy.
+
+    Keywords are tokenized once at build time and stored as token tuples;
+    classifying a skill looks up each of its token n-grams (up to the
+    longest keyword) in one dict, so the cost depends on the skill length
+    only, not on the size of the taxonomy. Keywords match whole words:
+    "Java" no longer matches "JavaScript", nor "SQL" "NoSQL".
+
+    SkillClassifier.load opens a compiled index (see build_taxonomy) instead.
+    """
+
+    def __init__(self, taxonomy: Dict[str, Sequence[str]]):
+        index: Dict[Tuple[str, ...], List[Tuple[str, float]]] = {}
+        max_ngram = 1
+        for category, keywords in taxonomy.items():
+            for keyword in keywords:
+                tokens = tokenize(keyword)
+                if not tokens:
+                    continue
+                matches = index.setdefault(tokens, [])
+                if category not in [match[0] for match in matches]:
+                    matches.append((category, 1.0))
+                max_ngram = max(max_ngram, len(tokens))
+        self._setup(list(taxonomy), index, max_ngram)
+
+    @classmethod
+    def load(cls, path: str) -> "SkillClassifier":
+        """Open a compiled taxonomy index written by build_taxonomy (memory-mapped)."""
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        classifier = cls.__new__(cls)
+        classifier._setup(meta["categories"], MappedTaxonomyIndex(path, meta), meta["max_ngram"])
+        return classifier
+
+    def _setup(self, categories: List[str], index, max_ngram: int) -> None:
+        self.categories = categories
+        self._order = {category: i for i, category in enumerate(categories)}
+        self._index = index
+        self._max_ngram = max_ngram
+        self._memo: Dict[str, List[Tuple[str, float]]] = {}
+        self._memo_size = 100000
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def classify(self, skill: str) -> List[Tuple[str, float]]:
+        """
+        Every matching category with its score, best first. The score is
+        the share of the skill's tokens covered by that category's keywords,
+        each token counted with the weight of its best keyword (1.0 = the
+        skill is entirely made of full-weight keywords of the category).
+        """
+        result = self._memo.get(skill)
+        if result is None:
+            result = self.classify_tokens(tokenize(skill))
+            if len(self._memo) < self._memo_size:
+                self._memo[skill] = result
+        return result
+
+    def classify_tokens(self, tokens: Tuple[str, ...]) -> List[Tuple[str, float]]:
+        covered: Dict[str, Dict[int, float]] = {}
+        index = self._index
+        for n in range(min(self._max_ngram, len(tokens)), 0, -1):
+            for start in range(len(tokens) - n + 1):
+                matches = index.get(tokens[start:start + n])
+                if matches:
+                    for category, weight in matches:
+                        positions = covered.setdefault(category, {})
+                        for position in range(start, start + n):
+                            if weight > positions.get(position, 0.0):
+                                positions[position] = weight
+
+        return sorted(
+            ((category, sum(positions.values()) / len(tokens)) for category, positions in covered.items()),
+            key=lambda item: (-item[1], self._order[item[0]]),
+        )
+
+    def best(self, skill: str, default: Optional[str] = None) -> Optional[str]:
+        """The highest-scoring category, or `default` if nothing matches."""
+        matches = self.classify(skill)
+        return matches[0][0] if matches else default
+
+    def group(self, skills: Iterable[str], default: str, limit: Optional[int] = None) -> Dict[str, List[str]]:
+        """
+        Bucket skills by their best category (unmatched ones under `default`),
+        keeping every category in taxonomy order and at most `limit` per bucket.
+        """
+        groups = {category: [] for category in self.categories}
+        groups.setdefault(default, [])
+        for skill in skills:
+            bucket = groups[self.best(skill, default)]
+            if limit is None or len(bucket) < limit:
+                bucket.append(skill)
+        return groups
+
+# -------------------------
+# Compiled Taxonomy Index
+# -------------------------
+# On disk: `<path>` holds three arrays of `entries` rows sorted by key hash
+# (uint64 key hashes, float32 weights, uint16 category ids) and
+# `<path>.json` the category names and sizes. Loading maps the file, so
+# start-up is a few milliseconds and the pages are shared between processes.
+def _key_hash(tokens: Sequence[str]) -> int:
+    return int.from_bytes(hashlib.blake2b(" ".join(tokens).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MappedTaxonomyIndex:
+    """Read-only token tuple -> [(category, weight)] lookup over a memory-mapped index file."""
+
+    def __init__(self, path: str, meta: Dict):
+        entries = meta["entries"]
+        self.names = meta["categories"]
+        self.keywords = meta["keywords"]
+        if entries:
+            self.keys = np.memmap(path, dtype="<u8", mode="r", shape=(entries,))
+            self.weights = np.memmap(path, dtype="<f4", mode="r", shape=(entries,), offset=8 * entries)
+            self.category_ids = np.memmap(path, dtype="<u2", mode="r", shape=(entries,), offset=12 * entries)
+        else:
+            self.keys = np.zeros(0, dtype="<u8")
+
+    def __len__(self) -> int:
+        return self.keywords
+
+    def get(self, tokens: Tuple[str, ...]) -> Optional[List[Tuple[str, float]]]:
+        key = np.uint64(_key_hash(tokens))
+        row = int(np.searchsorted(self.keys, key))
+        matches = []
+        while row < len(self.keys) and self.keys[row] == key:
+            matches.append((self.names[self.category_ids[row]], round(float(self.weights[row]), 3)))
+            row += 1
+        return matches or None
+
+
+def write_taxonomy_index(entries: Dict[Tuple[str, ...], Dict[str, float]], categories: List[str],
+                         out_path: str, metadata: Optional[Dict] = None) -> None:
+    """Write {token tuple: {category: weight}} as a compiled index (see MappedTaxonomyIndex)."""
+    category_ids = {category: i for i, category in enumerate(categories)}
+    rows = sorted(
+        (_key_hash(tokens), weight, category_ids[category])
+        for tokens, weights in entries.items()
+        for category, weight in weights.items()
+    )
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(out_path + ".tmp", "wb") as f:
+        f.write(np.array([row[0] for row in rows], dtype="<u8").tobytes())
+        f.write(np.array([row[1] for row in rows], dtype="<f4").tobytes())
+        f.write(np.array([row[2] for row in rows], dtype="<u2").tobytes())
+    meta = dict(metadata or {})
+    meta.update({
+        "categories": categories,
+        "entries": len(rows),
+        "keywords": len(entries),
+        "max_ngram": max((len(tokens) for tokens in entries), default=1),
+    })
+    with open(out_path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(out_path + ".tmp", out_path)
+    os.replace(out_path + ".json.tmp", out_path + ".json")
+
+# -------------------------
+# Taxonomy Build
+# -------------------------
+# Corpus phrases longer than this are descriptions, not skill keywords
+MAX_KEYWORD_TOKENS = 4
+
+
+def iter_skill_lists(path: str, column: str = "job_skills", chunksize: int = 50000) -> Iterator[List[Tuple[str, ...]]]:
+    """Stream the comma-separated skill list of each job as distinct token tuples."""
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, usecols=[column], chunksize=chunksize):
+        for value in chunk[column]:
+            if not isinstance(value, str):
+                continue
+            skills = {tokenize(skill) for skill in value.split(",")}
+            yield [tokens for tokens in skills if 0 < len(tokens) <= MAX_KEYWORD_TOKENS]
+
+
+def build_taxonomy(source: str, out_path: str, seed: Dict[str, Sequence[str]] = DEFAULT_TAXONOMY,
+                   column: str = "job_skills", min_count: int = 20, min_weight: float = 0.4) -> Dict[str, int]:
+    """
+    Derive a taxonomy from a skills corpus (one comma-separated skill list
+    per job, e.g. data/skills_preprocessed.csv) and write it as a compiled
+    index to `out_path`.
+
+    Two passes over the file: the first counts how many jobs mention each
+    skill phrase; the second counts, for every phrase seen in at least
+    `min_count` jobs, how often it co-occurs with each `seed` category.
+    Phrases that the seed keywords already cover keep that category; the
+    others are assigned to the category they are most over-represented
+    with (lift over the category's base rate), weighted by that category's
+    share of the lift, if it is at least `min_weight`. Different spellings
+    of a skill share one token key, so they end up as one entry.
+    """
+    started = time.time()
+    seed_classifier = SkillClassifier(seed)
+
+    jobs = 0
+    counts: Counter = Counter()
+    for skills in iter_skill_lists(source, column):
+        jobs += 1
+        counts.update(skills)
+    frequent = {tokens: count for tokens, count in counts.items() if count >= min_count}
+    del counts
+    print(f"{jobs} jobs, {len(frequent)} phrases in at least {min_count} jobs", file=sys.stderr)
+
+    seed_category: Dict[Tuple[str, ...], Optional[str]] = {}
+
+    def best_seed_category(tokens: Tuple[str, ...]) -> Optional[str]:
+        if tokens not in seed_category:
+            matches = seed_classifier.classify_tokens(tokens)
+            seed_category[tokens] = matches[0][0] if matches else None
+        return seed_category[tokens]
+
+    category_jobs: Counter = Counter()
+    cooccurrence: Dict[Tuple[str, ...], Counter] = {tokens: Counter() for tokens in frequent}
+    for skills in iter_skill_lists(source, column):
+        categories = {best_seed_category(tokens) for tokens in skills} - {None}
+        category_jobs.update(categories)
+        for tokens in skills:
+            if tokens in cooccurrence:
+                cooccurrence[tokens].update(categories)
+
+    entries: Dict[Tuple[str, ...], Dict[str, float]] = {}
+    for category, keywords in seed.items():
+        for keyword in keywords:
+            if tokenize(keyword):
+                entries.setdefault(tokenize(keyword), {})[category] = 1.0
+
+    derived = 0
+    for tokens, count in frequent.items():
+        if tokens in entries:
+            continue
+        direct = {category: score for category, score in seed_classifier.classify_tokens(tokens) if score >= 0.5}
+        if direct:
+            entries[tokens] = direct
+            derived += 1
+            continue
+        lifts = {
+            category: (together / count) / (category_jobs[category] / jobs)
+            for category, together in cooccurrence[tokens].items() if category_jobs[category]
+        }
+        if not lifts:
+            continue
+        best = max(lifts, key=lifts.get)
+        weight = lifts[best] / sum(lifts.values())
+        if weight >= min_weight:
+            entries[tokens] = {best: round(weight, 3)}
+            derived += 1
+
+    write_taxonomy_index(entries, list(seed), out_path, {"source": os.path.basename(source), "jobs": jobs})
+    stats = {"jobs": jobs, "phrases": len(frequent), "keywords": len(entries), "derived": derived}
+    print(f"{len(entries)} keywords ({derived} derived) written in {time.time() - started:.1f}s", file=sys.stderr)
+    return stats
+
+# -------------------------
+# Shared Instances
+# -------------------------
+_classifiers: Dict[str, SkillClassifier] = {}
+_classifiers_lock = threading.Lock()
+
+
+def load_taxonomy(path: str = "") -> Dict[str, List[str]]:
+    """Read a {category: [keywords]} JSON file, or return DEFAULT_TAXONOMY if no path is given."""
+    if not path:
+        return DEFAULT_TAXONOMY
+    with open(path, encoding="utf-8") as f:
+        taxonomy = json.load(f)
+    if not isinstance(taxonomy, dict):
+        raise ValueError(f"Taxonomy file {path} must contain a JSON object")
+    return taxonomy
+
+
+def _default_taxonomy_path() -> str:
+    if config.SKILL_TAXONOMY_PATH:
+        return config.SKILL_TAXONOMY_PATH
+    if os.path.exists(config.SKILL_TAXONOMY_INDEX + ".json"):
+        return config.SKILL_TAXONOMY_INDEX
+    return ""
+
+
+def get_classifier(path: Optional[str] = None) -> SkillClassifier:
+    """
+    Process-wide classifier, built or mapped once per path. By default this
+    is SKILL_TAXONOMY_PATH, else the compiled corpus index at
+    SKILL_TAXONOMY_INDEX if it has been built, else DEFAULT_TAXONOMY.
+    A ".json" path is a plain {category: [keywords]} file.
+    """
+    path = _default_taxonomy_path() if path is None else path
+    classifier = _classifiers.get(path)
+    if classifier is None:
+        with _classifiers_lock:
+            classifier = _classifiers.get(path)
+            if classifier is None:
+                if path and not path.endswith(".json"):
+                    classifier = SkillClassifier.load(path)
+                else:
+                    classifier = SkillClassifier(load_taxonomy(path))
+                _classifiers[path] = classifier
+    return classifier
@@ -0,0 +1,143 @@
+import fnmatch
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_store import RedisCache, SQLiteCache, single_flight
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis client calls RedisCache makes."""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def get(self, key):
+        with self.lock:
+            return self.values[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        with self.lock:
+            if nx and self._alive(key):
+                return None
+            self.values[key] = value.encode("utf-8") if isinstance(value, str) else value
+            self.expires.pop(key, None)
+            if ex:
+                self.expires[key] = time.time() + ex
+            elif px:
+                self.expires[key] = time.time() + px / 1000
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.values.pop(key, None)
+                self.expires.pop(key, None)
+
+    def scan_iter(self, match):
+        with self.lock:
+            return [key for key in list(self.values) if fnmatch.fnmatch(key, match)]
+
+    def eval(self, script, numkeys, key, token):
+        # Only RedisCache.RELEASE_SCRIPT is ever evaluated
+        with self.lock:
+            if self._alive(key) and self.values[key] == token.encode("utf-8"):
+                self.values.pop(key)
+                self.expires.pop(key, None)
+                return 1
+            return 0
+
+
+def _compute_in_process(path, counter):
+    def compute():
+        with counter.get_lock():
+            counter.value += 1
+        time.sleep(0.3)
+        return b"value"
+
+    assert single_flight(SQLiteCache(path), "key", compute, lease=10, poll=0.02) == b"value"
+
+
+class TestRedisSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.cache = RedisCache(client=FakeRedis(), ttl=60, prefix="test:")
+
+    def test_concurrent_callers_compute_once(self):
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return b"value"
+
+        threads = [threading.Thread(target=lambda: results.append(single_flight(self.cache, "key", compute, poll=0.02)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b"value"] * 6)
+        self.assertEqual(self.cache.get("key"), b"value")
+
+    def test_expired_lease_is_taken_over(self):
+        # A holder that died without releasing its lease
+        self.assertIsNotNone(self.cache.acquire_lease("key", 0.2))
+        started = time.time()
+        self.assertEqual(single_flight(self.cache, "key", lambda: b"value", lease=5, poll=0.02), b"value")
+        self.assertLess(time.time() - started, 2)
+
+    def test_stale_token_does_not_release_new_lease(self):
+        old = self.cache.acquire_lease("key", 0.05)
+        time.sleep(0.1)
+        new = self.cache.acquire_lease("key", 5)
+        self.assertIsNotNone(new)
+        self.cache.release_lease("key", old)
+        self.assertIsNone(self.cache.acquire_lease("key", 5))
+        self.cache.release_lease("key", new)
+        self.assertIsNotNone(self.cache.acquire_lease("key", 5))
+
+    def test_none_is_not_stored(self):
+        self.assertIsNone(single_flight(self.cache, "key", lambda: None))
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(single_flight(self.cache, "key", lambda: b"later"), b"later")
+
+
+class TestSQLiteSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_processes_compute_once(self):
+        path = os.path.join(self.tmp, "cache.sqlite")
+        SQLiteCache(path)
+        counter = multiprocessing.Value("i", 0)
+        processes = [multiprocessing.Process(target=_compute_in_process, args=(path, counter)) for _ in range(5)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+        self.assertEqual([process.exitcode for process in processes], [0] * 5)
+        self.assertEqual(counter.value, 1)
+        self.assertEqual(SQLiteCache(path).get("key"), b"value")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_extraction import extract_fields_by_rules, extract_main_text
+
+POSTING = ("<h1>Senior Data Engineer</h1>"
+           "<p>We are hiring a senior data engineer to build batch and streaming pipelines in Python.</p>"
+           "<p>You will own our Spark and Airflow platform together with a team of five engineers.</p>")
+
+
+class TestExtractMainText(unittest.TestCase):
+    def test_banner_menu_and_footer_with_content_words_are_dropped(self):
+        html = f"""<html><body>
+            <div class="cookie-consent-content"><p>We use cookies to improve your experience, accept all?</p></div>
+            <div class="main-menu"><ul><li><a href="/">Home page of our company</a></li>
+                <li><a href="/jobs">All our open jobs and careers</a></li></ul></div>
+            <div class="job">{POSTING}</div>
+            <div class="related-jobs-content"><p>Another job you might like a lot, apply there too.</p></div>
+            <div class="footer-content"><p>Copyright 2024 ACME GmbH, all rights reserved worldwide.</p></div>
+        </body></html>"""
+        text = extract_main_text(html)
+        self.assertTrue(text.startswith("Senior Data Engineer"))
+        self.assertIn("Spark and Airflow", text)
+        for boilerplate in ("cookies", "Home page", "Another job", "Copyright"):
+            self.assertNotIn(boilerplate, text)
+
+    def test_wrapper_with_sidebar_class_is_kept(self):
+        html = f'<html><body><div class="page-wrapper has-sidebar"><article>{POSTING}</article></div></body></html>'
+        self.assertIn("batch and streaming pipelines", extract_main_text(html))
+
+    def test_header_block_with_title_is_kept(self):
+        html = f"""<html><body>
+            <div class="content-header"><h1>Data Engineer</h1><span>Berlin</span></div>
+            <div class="job">{POSTING.replace("<h1>Senior Data Engineer</h1>", "")}</div>
+            <div class="share"><a href="#">Share on twitter</a></div>
+        </body></html>"""
+        text = extract_main_text(html)
+        self.assertTrue(text.startswith("Data Engineer\nBerlin"))
+        self.assertNotIn("twitter", text)
+
+    def test_content_id_overrides_boilerplate_class(self):
+        html = f'<html><body><div id="main" class="has-sidebar">{POSTING}</div></body></html>'
+        self.assertIn("Spark and Airflow", extract_main_text(html))
+
+    def test_deeply_nested_boilerplate(self):
+        depth = 400
+        html = "<html><body>" + '<div class="sidebar">' * depth + "<p>Related links for you to read later on.</p>" \
+               + "</div>" * depth + f'<div class="job">{POSTING}</div></body></html>'
+        text = extract_main_text(html)
+        self.assertIn("Spark and Airflow", text)
+        self.assertNotIn("Related links", text)
+
+    def test_falls_back_to_body_text(self):
+        html = '<html><body><div class="menu">Only a short line here</div></body></html>'
+        self.assertEqual(extract_main_text(html), "Only a short line here")
+
+
+class TestRuleExtractors(unittest.TestCase):
+    def _rule(self, field, text):
+        return extract_fields_by_rules(text, [field]).get(field, "")
+
+    def test_remote_policy(self):
+        cases = {
+            "Remote work is not possible; on-site role with no home office.": "None",
+            "No remote work, sorry.": "None",
+            "Kein Homeoffice möglich.": "None",
+            "Homeoffice ist nicht möglich.": "None",
+            "No commute: work remote from anywhere in Germany, 100% remote.": "Fully Remote",
+            "Remote-first company.": "Fully Remote",
+            "Hybrid setup with 2 days in the office.": "Partial",
+            "We offer home office two days a week.": "Partial",
+            "You work on-site in our Munich lab.": "None",
+            "Fully remote, hybrid for the Berlin team.": "",
+            "Remote possible.": "",
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self._rule("remote_policy", text), expected)
+
+    def test_location(self):
+        cases = {
+            "Location: Hamburg\nWe also have an office in Berlin. Berlin is great.": "Hamburg",
+            "Teams in Berlin and Munich; most of us sit in Berlin.": "Berlin",
+            "Kostenloses Essen und Getränke.": "",
+            "Kostenloses Essen und Getränke in unserem Büro in Köln.": "Köln",
+            "Standort: Essen\nKostenloses Essen.": "Essen",
+            "We are looking for a Python developer.": "",
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self._rule("location", text), expected)
+
+    def test_salary(self):
+        self.assertEqual(self._rule("salary_range", "Salary: €60,000 - €75,000 per year"), "€60,000 - €75,000")
+        self.assertEqual(self._rule("salary_range", "Gehalt: 55.000 EUR brutto"), "55.000 EUR")
+        self.assertEqual(self._rule("salary_range", "Founded in 2010 - 2015 we grew to 300 people"), "")
+
+    def test_website_skips_job_boards(self):
+        text = "Apply via https://www.linkedin.com/jobs/123 or see https://acme.example.com/careers."
+        self.assertEqual(self._rule("company_website", text), "https://acme.example.com/careers")
+
+    def test_travel(self):
+        self.assertEqual(self._rule("travel_required", "Travel up to 20% to customer sites."),
+                         "Travel up to 20% to customer sites")
+        self.assertEqual(self._rule("travel_required", "We love travel photos."), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from faiss_integration import DOCUMENTS_FILE, INDEX_FILE, LEGACY_DOCUMENTS_FILE, DocumentStore, VectorIndex
+
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, 8)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestVectorIndexStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.vectors = _vectors(20)
+        VectorIndex.build(self.vectors, [{"text": f"doc {i}"} for i in range(20)], kind="flat").save(self.tmp)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_loaded_index_reads_documents_per_hit(self):
+        index = VectorIndex.load(self.tmp)
+        hits = index.search(self.vectors[3], k=2)[0]
+        self.assertEqual(hits[0]["text"], "doc 3")
+        self.assertAlmostEqual(hits[0]["score"], 1.0, places=5)
+
+    def test_incremental_save_appends_and_marks_stale(self):
+        index = VectorIndex.load(self.tmp, mmap=False)
+        extra = _vectors(1, seed=1)
+        index.add(extra, [{"text": "doc 20"}])
+        index.mark_stale([3, 3])
+        index.save(self.tmp)
+
+        reloaded = VectorIndex.load(self.tmp)
+        self.assertEqual((len(reloaded), reloaded.stale_count), (21, 1))
+        self.assertNotIn("doc 3", [hit["text"] for hit in reloaded.search(self.vectors[3], k=3)[0]])
+        self.assertEqual(reloaded.search(extra, k=1)[0][0]["text"], "doc 20")
+
+    def test_rows_beyond_the_index_are_ignored(self):
+        # An interrupted save: documents committed, index file not replaced
+        DocumentStore(os.path.join(self.tmp, DOCUMENTS_FILE)).write(20, [{"text": "orphan"}, None])
+        index = VectorIndex.load(self.tmp, mmap=False)
+        self.assertEqual((len(index), index.stale_count), (20, 0))
+        index.add(_vectors(1, seed=2), [{"text": "doc 20"}])
+        index.save(self.tmp)
+        self.assertEqual(VectorIndex.load(self.tmp).documents([20]), [{"text": "doc 20"}])
+
+    def test_legacy_jsonl_documents_are_imported(self):
+        legacy = os.path.join(self.tmp, "legacy")
+        os.makedirs(legacy)
+        index = faiss.IndexFlatIP(8)
+        index.add(self.vectors[:2])
+        faiss.write_index(index, os.path.join(legacy, INDEX_FILE))
+        with open(os.path.join(legacy, LEGACY_DOCUMENTS_FILE), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"text": "old 0"}) + "\n" + json.dumps(None) + "\n")
+
+        loaded = VectorIndex.load(legacy)
+        self.assertEqual(loaded.stale_count, 1)
+        self.assertEqual([hit["text"] for hit in loaded.search(self.vectors[0], k=2)[0]], ["old 0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
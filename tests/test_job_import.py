@@ -0,0 +1,57 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import job_import
+from faiss_integration import VectorIndex
+
+
+def _random_vectors(texts, **kwargs):
+    vectors = np.random.default_rng(len(texts)).standard_normal((len(texts), 16)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, "records.csv")
+        self.index_dir = os.path.join(self.tmp, "index")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _ingest(self, texts, ids, **kwargs):
+        pd.DataFrame({"id": ids, "text": texts}).to_csv(self.source, index=False)
+        with mock.patch("embeddings.embed_texts", _random_vectors):
+            stats = job_import.ingest(self.source, "text", id_column="id", index_dir=self.index_dir, **kwargs)
+        return stats, VectorIndex.load(self.index_dir)
+
+    def test_repeated_key_across_batches_keeps_one_live_row(self):
+        for kind in ("ivf", "flat", "hnsw"):
+            with self.subTest(kind=kind):
+                shutil.rmtree(self.index_dir, ignore_errors=True)
+                texts = [f"version {i}" for i in range(600)]
+                stats, index = self._ingest(texts, ["same"] * 600, kind=kind, batch_size=100)
+                self.assertEqual((stats["added"], stats["changed"]), (1, 5))
+                self.assertEqual(len(index) - index.stale_count, 1)
+                live = [doc for doc in index.documents(range(len(index))) if doc is not None]
+                self.assertEqual(live[0]["text"], "version 599")
+
+    def test_ivf_is_trained_on_small_corpus_with_large_hint(self):
+        stats, index = self._ingest([f"record {i}" for i in range(300)], list(range(300)),
+                                    kind="ivf", expected_rows=100000, batch_size=100)
+        self.assertEqual(stats["added"], 300)
+        self.assertEqual(len(index), 300)
+        self.assertEqual(len(index.search(_random_vectors(["query"]), k=3)[0]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
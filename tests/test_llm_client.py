@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client
+from llm_client import BACKGROUND, LLMScheduler, RequestCoalescer
+
+
+class TestCoalescedPriority(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = LLMScheduler({"ollama": 1})
+        self.coalescer = RequestCoalescer(self.scheduler)
+        self.order = []
+        self.release = threading.Event()
+
+    def _wait_for_queue(self, depth):
+        deadline = time.time() + 5
+        while self.scheduler.metrics().get("ollama", {}).get("queue_depth", 0) < depth:
+            self.assertLess(time.time(), deadline, "requests never queued")
+            time.sleep(0.01)
+
+    def _request(self, name):
+        with self.scheduler.slot("ollama"):
+            self.order.append(name)
+        return name
+
+    def _hold_slot(self):
+        with self.scheduler.slot("ollama"):
+            self.release.wait(5)
+
+    def _background_leader(self, results):
+        with llm_client.priority(BACKGROUND):
+            results.append(self.coalescer.run("profile", lambda: self._request("profile")))
+
+    def test_interactive_follower_promotes_background_leader(self):
+        results = []
+        threads = [threading.Thread(target=self._hold_slot)]
+        threads[0].start()
+        time.sleep(0.05)
+
+        threads.append(threading.Thread(target=self._background_leader, args=(results,)))
+        threads[-1].start()
+        self._wait_for_queue(1)
+        # An interactive request for another prompt, queued after the background one
+        threads.append(threading.Thread(target=lambda: self._request("other")))
+        threads[-1].start()
+        self._wait_for_queue(2)
+        # The interactive caller of the same prompt joins the background leader
+        threads.append(threading.Thread(target=lambda: results.append(self.coalescer.run("profile", lambda: "unused"))))
+        threads[-1].start()
+        deadline = time.time() + 5
+        while self.coalescer.coalesced < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.order, ["profile", "other"])
+        self.assertEqual(results, ["profile", "profile"])
+
+    def test_background_leader_without_interactive_follower_keeps_its_place(self):
+        results = []
+        threads = [threading.Thread(target=self._hold_slot)]
+        threads[0].start()
+        time.sleep(0.05)
+        threads.append(threading.Thread(target=self._background_leader, args=(results,)))
+        threads[-1].start()
+        self._wait_for_queue(1)
+        threads.append(threading.Thread(target=lambda: self._request("other")))
+        threads[-1].start()
+        self._wait_for_queue(2)
+
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.order, ["other", "profile"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import url_fetcher
+from cache_store import SQLiteCache
+
+BIG_BODY = b"x" * 5000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        _Handler.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/page":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(200, b"<p>Data Engineer</p>", {"ETag": '"v1"'})
+        elif self.path == "/big":
+            self._send(200, BIG_BODY)
+        elif self.path == "/bad-charset":
+            self._send(200, "Gehalt 50.000 €".encode("utf-8"), content_type="text/html; charset=utf8mb4")
+        else:
+            self._send(500, b"boom")
+
+    def _send(self, status, body, headers=None, content_type="text/html; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFetchUrls(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        url_fetcher._http_cache = SQLiteCache(os.path.join(self.tmp, "http.sqlite"))
+        _Handler.requests_seen.clear()
+
+    def tearDown(self):
+        url_fetcher._http_cache = None
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_ok_then_revalidated_from_cache(self):
+        first, = url_fetcher.fetch_urls_sync([self.base + "/page"])
+        self.assertEqual((first["status"], first["error"], first["from_cache"]), (200, "", False))
+        self.assertIn("Data Engineer", first["text"])
+
+        second, = url_fetcher.fetch_urls_sync([self.base + "/page"])
+        self.assertEqual((second["status"], second["from_cache"]), (304, True))
+        self.assertEqual(second["text"], first["text"])
+        self.assertEqual(_Handler.requests_seen[-1], ("/page", '"v1"'))
+
+    def test_body_is_capped(self):
+        result, = url_fetcher.fetch_urls_sync([self.base + "/big"], max_bytes=1000)
+        self.assertTrue(result["truncated"])
+        self.assertEqual(len(result["text"]), 1000)
+
+    def test_errors_are_reported_per_url(self):
+        unused_port = f"http://127.0.0.1:{self._free_port()}/"
+        urls = [self.base + "/missing", unused_port, self.base + "/bad-charset", self.base + "/page"]
+        results = url_fetcher.fetch_urls_sync(urls, use_cache=False)
+
+        self.assertEqual([result["url"] for result in results], urls)
+        self.assertEqual(results[0]["status"], 500)
+        self.assertTrue(results[0]["error"])
+        self.assertTrue(results[1]["error"])
+        self.assertEqual((results[2]["error"], results[2]["text"]), ("", "Gehalt 50.000 €"))
+        self.assertEqual((results[3]["status"], results[3]["error"]), (200, ""))
+
+    @staticmethod
+    def _free_port():
+        import socket
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
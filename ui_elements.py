@@ -1,13 +1,15 @@
 #ui_elements.py
 import streamlit as st
-import json
 from functions import (
     store_in_state,
     get_from_session_state,
     process_uploaded_file,
     extract_content_from_url,
-    fetch_from_llama
+    REMOTE_POLICY_OPTIONS
 )
+from data_extraction import extract_fields
+from prefetch import prefetch_role_suggestions, get_prefetched_suggestions
+import llm_client
 
 # --------------------------------------------------
 # GLOBAL STYLING (Per PNG & Branding Guidelines)
@@ -85,6 +87,22 @@ def show_progress_bar(current_page, total_pages):
     progress_val = (current_page + 1) / total_pages
     st.progress(progress_val)
 
+def show_llm_metrics():
+    """Sidebar panel with the LLM scheduler metrics (enabled with LLM_SHOW_METRICS=1)."""
+    metrics = llm_client.get_metrics()
+    with st.sidebar.expander("LLM queue"):
+        st.caption(f"Coalesced duplicate requests: {metrics.pop('coalesced_requests')}")
+        for backend, stats in metrics.items():
+            st.markdown(
+                f"**{backend}** · in flight {stats['in_flight']}/{stats['limit']} · "
+                f"queued {stats['queue_depth']} (max {stats['max_queue_depth']}) · "
+                f"done {stats['completed']}, failed {stats['failed']}"
+            )
+            st.caption(
+                "wait avg {avg:.1f}s / p95 {p95:.1f}s / max {max:.1f}s".format(**stats["wait_seconds"]) + " · "
+                + "service avg {avg:.1f}s / p95 {p95:.1f}s / max {max:.1f}s".format(**stats["service_seconds"])
+            )
+
 def show_navigation(current_page, total_pages):
     """
     Displays Next/Previous buttons, updates st.session_state["current_section"].
@@ -103,6 +121,33 @@ def show_navigation(current_page, total_pages):
                 st.session_state["current_section"] += 1
                 st.experimental_rerun()
 
+def render_stream(tokens):
+    """
+    Render a token stream into a single placeholder as it arrives and
+    return the full text once the stream is exhausted.
+    """
+    placeholder = st.empty()
+    text = ""
+    for token in tokens:
+        text += token
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+def show_suggestions(section, label):
+    """
+    Show the prefetched role suggestions for one section as a caption,
+    or a note if they are still being generated; never waits for them.
+    """
+    job_title = get_from_session_state("job_title", "")
+    if not job_title:
+        return
+    suggestions = get_prefetched_suggestions(job_title, section)
+    if suggestions is None:
+        st.caption(f"💡 {label}: still loading, they will show up on your next interaction.")
+    elif suggestions:
+        st.caption(f"💡 {label}: " + ", ".join(suggestions))
+
 # --------------------------------------------------
 # 2) START DISCOVERY PAGE
 # --------------------------------------------------
@@ -117,6 +162,8 @@ def start_discovery_page():
         with colA:
             job_title = st.text_input("Enter a **Job Title**", get_from_session_state("job_title", ""))
             store_in_state("job_title", job_title)
+            # Warm up role suggestions for the later pages while the user keeps typing
+            prefetch_role_suggestions(job_title)
 
             input_url = st.text_input("🔗 Enter URL (Job Ad or Company Website)", get_from_session_state("input_url", ""))
             store_in_state("input_url", input_url)
@@ -124,7 +171,14 @@ def start_discovery_page():
         with colB:
             uploaded_file = st.file_uploader("📂 Upload Job Ad (PDF, DOCX, TXT)", type=["pdf", "docx", "txt"])
             if uploaded_file:
-                text_data = process_uploaded_file(uploaded_file)
+                progress = st.empty()
+                text_data = process_uploaded_file(
+                    uploaded_file,
+                    on_page=lambda page: progress.progress(
+                        page.number / page.total, text=f"Reading page {page.number}/{page.total}"
+                    )
+                )
+                progress.empty()
                 store_in_state("uploaded_file", text_data)
 
     if st.button("🔍 Analyze Sources"):
@@ -145,36 +199,24 @@ def start_discovery_page():
             st.warning("No text found to analyze.")
             return
 
-        # AI-driven job ad analysis
-        extraction_prompt = f"""
-        You are an AI that extracts structured job or company details from the text below.
-        Return ONLY valid JSON with these fields:
-        - company_name
-        - location
-        - company_website
-        - technologies_used
-        - travel_required
-        - remote_policy
-        - tasks
-        - salary_range
-        - benefits
-        - learning_opportunities
-        - health_benefits
-
-        Text to analyze:
-        {combined_text}
-
-        Return the JSON object with these keys. If data is not found, use an empty string.
-        """
+        # AI-driven job ad analysis, chunked to fit the model's context window
+        live_fields = {}
+        live_placeholder = st.empty()
+
+        def show_field(key, value):
+            live_fields[key] = ", ".join(value) if isinstance(value, list) else value
+            live_placeholder.markdown("\n".join(f"- **{k}**: {v}" for k, v in live_fields.items()))
 
-        response_text = fetch_from_llama(extraction_prompt)
+        with st.spinner("Extracting job details..."):
+            fields, failed_chunks = extract_fields(combined_text, on_field=show_field)
 
-        try:
-            parsed_json = json.loads(response_text)
-            for key in parsed_json:
-                store_in_state(key, parsed_json[key])
+        if fields:
+            for key, value in fields.items():
+                store_in_state(key, value)
             st.success("✅ Successfully auto-filled fields from text!")
-        except json.JSONDecodeError:
+            if failed_chunks:
+                st.warning(f"⚠️ {failed_chunks} part(s) of the text could not be analyzed.")
+        else:
             st.error("❌ Failed to parse JSON from AI response.")
 
 # --------------------------------------------------
@@ -236,9 +278,11 @@ def department_information_page():
         travel_required = st.text_area("Travel Requirements", get_from_session_state("travel_required", ""))
         store_in_state("travel_required", travel_required)
 
-        remote_opts = ["None", "Partial", "Fully Remote"]
         default_remote = get_from_session_state("remote_policy", "None")
-        remote_policy = st.selectbox("Remote Work Policy", remote_opts, index=remote_opts.index(default_remote))
+        if default_remote not in REMOTE_POLICY_OPTIONS:
+            default_remote = "None"
+        remote_policy = st.selectbox("Remote Work Policy", REMOTE_POLICY_OPTIONS,
+                                     index=REMOTE_POLICY_OPTIONS.index(default_remote))
         store_in_state("remote_policy", remote_policy)
 
 # --------------------------------------------------
@@ -303,6 +347,8 @@ def skills_competencies_page():
         soft_skills = st.text_area("Soft Skills", get_from_session_state("soft_skills", ""))
         store_in_state("soft_skills", soft_skills)
 
+        show_suggestions("skills", "Suggested skills")
+
 # --------------------------------------------------
 # 8) BENEFITS & COMPENSATION PAGE
 # --------------------------------------------------
@@ -315,6 +361,7 @@ def benefits_compensation_page():
 
         benefits = st.text_area("Key Benefits", get_from_session_state("benefits", ""))
         store_in_state("benefits", benefits)
+        show_suggestions("benefits", "Suggested benefits")
 
         health_benefits = st.text_area("Health Benefits", get_from_session_state("health_benefits", ""))
         store_in_state("health_benefits", health_benefits)
@@ -336,6 +383,8 @@ def recruitment_process_page():
         )
         store_in_state("interview_stages", interview_stages)
 
+        show_suggestions("recruitment_steps", "Suggested recruitment steps")
+
 # --------------------------------------------------
 # 10) SUMMARY & OUTPUTS PAGE
 # --------------------------------------------------
@@ -352,18 +401,16 @@ def summary_outputs_page():
         st.write("**Health Benefits**:", get_from_session_state("health_benefits", ""))
 
         if st.button("🎯 Generate Job Ad"):
-            from prompts import generate_job_ad
+            from prompts import stream_job_ad
             job_details = dict(st.session_state)
-            job_ad = generate_job_ad(job_details)
             st.subheader("Generated Job Ad")
-            st.write(job_ad)
+            render_stream(stream_job_ad(job_details))
 
         if st.button("📝 Generate Interview Guide"):
-            from prompts import generate_interview_prep
+            from prompts import stream_interview_prep
             job_details = dict(st.session_state)
-            guide = generate_interview_prep(job_details, "HR")
             st.subheader("Interview Preparation Guide")
-            st.write(guide)
+            render_stream(stream_interview_prep(job_details, "HR"))
 
     st.info("You can go back and adjust any section, or restart from the beginning.")
 
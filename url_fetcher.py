@@ -0,0 +1,109 @@
+# url_fetcher.py
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+
+import config
+from cache_store import SQLiteCache, make_key
+
+# -------------------------
+# HTTP Cache
+# -------------------------
+_http_cache: Optional[SQLiteCache] = None
+
+
+def get_http_cache() -> SQLiteCache:
+    """On-disk store of response bodies with their ETag/Last-Modified validators."""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = SQLiteCache(config.HTTP_CACHE_PATH, max_bytes=config.HTTP_CACHE_MAX_BYTES)
+    return _http_cache
+
+
+def _cache_lookup(cache: Optional[SQLiteCache], url: str) -> Optional[Dict]:
+    if cache is None:
+        return None
+    entry = cache.get_text(make_key("http", url))
+    return json.loads(entry) if entry else None
+
+
+def _cache_store(cache: Optional[SQLiteCache], url: str, etag: Optional[str], last_modified: Optional[str], text: str) -> None:
+    # Without a validator we could never revalidate the entry, so don't keep it
+    if cache is not None and (etag or last_modified):
+        entry = {"etag": etag, "last_modified": last_modified, "text": text}
+        cache.set_text(make_key("http", url), json.dumps(entry))
+
+# -------------------------
+# Fetching
+# -------------------------
+async def _read_limited(response: aiohttp.ClientResponse, max_bytes: int):
+    """Read at most max_bytes of the body in chunks; returns (bytes, truncated)."""
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        body.extend(chunk)
+        if len(body) >= max_bytes:
+            return bytes(body[:max_bytes]), True
+    return bytes(body), False
+
+
+async def _fetch_one(session: aiohttp.ClientSession, url: str, cache: Optional[SQLiteCache], max_bytes: int) -> Dict:
+    result = {"url": url, "status": None, "text": "", "from_cache": False, "truncated": False, "error": "", "elapsed": 0.0}
+    started = time.perf_counter()
+    cached = _cache_lookup(cache, url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        async with session.get(url, headers=headers) as response:
+            result["status"] = response.status
+            if response.status == 304 and cached:
+                result.update(text=cached["text"], from_cache=True)
+            else:
+                response.raise_for_status()
+                body, truncated = await _read_limited(response, max_bytes)
+                try:
+                    text = body.decode(response.charset or "utf-8", errors="replace")
+                except (LookupError, UnicodeError):
+                    # Unknown declared charset (e.g. "utf8mb4"); utf-8 is the best guess
+                    text = body.decode("utf-8", errors="replace")
+                result.update(text=text, truncated=truncated)
+                if not truncated:
+                    _cache_store(cache, url, response.headers.get("ETag"), response.headers.get("Last-Modified"), text)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        result["error"] = str(e) or type(e).__name__
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+async def fetch_urls(urls: Sequence[str], per_host: int = config.URL_FETCH_PER_HOST,
+                     max_connections: int = config.URL_FETCH_MAX_CONNECTIONS,
+                     max_bytes: int = config.URL_FETCH_MAX_BYTES, timeout: float = config.URL_FETCH_TIMEOUT,
+                     use_cache: bool = True) -> List[Dict]:
+    """
+    Fetch many URLs concurrently, at most `per_host` connections per host
+    and `max_connections` overall; `timeout` applies to connecting and to
+    each socket read. Bodies are streamed and cut off at `max_bytes`. Cached responses are revalidated with
+    If-None-Match/If-Modified-Since and reused on 304.
+
+    Returns one dict per URL, in input order: url, status, text, from_cache,
+    truncated, error ("" on success) and elapsed seconds.
+    """
+    cache = get_http_cache() if use_cache else None
+    connector = aiohttp.TCPConnector(limit=max_connections, limit_per_host=per_host)
+    # Per-socket timeouts: time spent queueing for a per-host slot must not count
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        return await asyncio.gather(*(_fetch_one(session, url, cache, max_bytes) for url in urls))
+
+
+def fetch_urls_sync(urls: Sequence[str], **kwargs) -> List[Dict]:
+    """Blocking wrapper around fetch_urls for the Streamlit script thread and CLI code."""
+    return asyncio.run(fetch_urls(urls, **kwargs))
@@ -1,6 +1,7 @@
-import requests
 from requests.exceptions import RequestException
 
+import llm_client
+
 def fetch_from_llama(prompt, model="koesn/dolphin-llama3-8b", num_ctx=8192):
     """
     Fetch suggestions from the local Llama model using the provided API.
@@ -14,17 +15,7 @@ def fetch_from_llama(prompt, model="koesn/dolphin-llama3-8b", num_ctx=8192):
     - list: A list of strings containing suggestions.
     """
     try:
-        response = requests.post(
-            "http://127.0.0.1:11434/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "num_ctx": num_ctx
-            },
-            stream=True
-        )
-        response.raise_for_status()
-        return response.json().get("text", "").split(",")
-    except RequestException as e:
+        text = llm_client.generate(prompt, model=model, options={"num_ctx": num_ctx})
+        return text.split(",")
+    except (RequestException, ValueError) as e:
         return [f"Error: Unable to fetch suggestions. Details: {e}"]
-